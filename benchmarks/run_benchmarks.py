@@ -0,0 +1,195 @@
+# ================================================================
+# run_benchmarks.py
+# Time every pipeline stage and tool on synthetic inputs
+# ================================================================
+# For each --scale, synthetic inputs are generated once into
+# benchmarks/work/scale-<N>/ (see synthetic.py) and then timed with
+# profiling.StageProfiler:
+#
+#   parse/<type>       parse_state_texts.parse_file on a report text
+#   score              regulatory_scoring.score_frame on parsed rows
+#   <stage>            every full_pipeline.py stage, recomputed
+#   save_outputs       GPKG / CSV / factor store writes
+#   dashboard, dashboard_smaller
+#                      the two folium dashboard builders
+#
+# Results are written to benchmarks/results/<commit>.json so runs on
+# different commits can be compared with --compare.
+#
+# Usage:
+#   python benchmarks/run_benchmarks.py [--scale 1 10 100] [--repeat 3]
+#   python benchmarks/run_benchmarks.py --compare BASE.json [HEAD.json]
+# ================================================================
+
+import argparse
+import json
+import os
+import platform
+import runpy
+import shutil
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+# synthetic puts scripts/ on sys.path
+from synthetic import REPORT_NAMES, SCORED_CSV, SCRIPTS_DIR, write_inputs
+
+import full_pipeline as fp
+from parse_state_texts import parse_file
+from profiling import StageProfiler
+from regulatory_scoring import score_frame
+from stage_graph import StageCache, run_stages
+
+BENCH_DIR = Path(__file__).resolve().parent
+WORK_DIR = BENCH_DIR / "work"
+RESULTS_DIR = BENCH_DIR / "results"
+REPO_DIR = BENCH_DIR.parent
+
+DASHBOARDS = {
+    "dashboard": SCRIPTS_DIR / "interactive_visualization.py",
+    "dashboard_smaller": SCRIPTS_DIR / "interactive_visualization_smaller.py",
+}
+# A stage counts as a regression in --compare when it is this much slower
+REGRESSION_RATIO = 1.2
+
+
+def git_commit():
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+    return git("rev-parse", "HEAD") or "unknown", bool(git("status", "--porcelain", "--", "scripts"))
+
+
+# ------------------------------------------------
+# 1. Benchmarks
+# ------------------------------------------------
+def bench_tools(profiler, root):
+    for report_type, name in REPORT_NAMES.items():
+        with profiler.stage(f"parse/{report_type}") as record:
+            record["rows"] = len(parse_file(root / "reports" / name, report_type))
+    parsed = pd.read_csv(root / "reports" / SCORED_CSV)
+    with profiler.stage("score") as record:
+        record["rows"] = len(score_frame(parsed))
+
+
+def bench_pipeline(profiler):
+    cache = StageCache(fp.stage_dir)
+    results = run_stages(fp.STAGES, cache, force={"all"}, profiler=profiler)
+    with profiler.stage("save_outputs") as record:
+        fp.save_outputs(results["index"])
+        record["rows"] = len(results["index"])
+
+
+def bench_dashboards(profiler):
+    for name, script in DASHBOARDS.items():
+        with profiler.stage(name):
+            runpy.run_path(str(script), run_name="__main__")
+
+
+def run_scale(scale, repeat, dashboards=True, regenerate=False):
+    root = WORK_DIR / f"scale-{scale}"
+    if regenerate or not (root / "inputs.json").exists():
+        print(f"… generating scale {scale} inputs in {root}")
+        write_inputs(root, scale)
+
+    records = []
+    cwd = os.getcwd()
+    # The scripts resolve ../data_raw and ../data_processed from scripts/
+    os.chdir(root / "scripts")
+    try:
+        for run in range(repeat):
+            # Start cold: no stage, port index, factor store or pyramid caches
+            shutil.rmtree(root / "data_processed", ignore_errors=True)
+            (root / "data_processed").mkdir()
+            profiler = StageProfiler(enabled=True)
+            bench_tools(profiler, root)
+            bench_pipeline(profiler)
+            if dashboards:
+                bench_dashboards(profiler)
+            records += [{"scale": scale, "run": run, **record} for record in profiler.records]
+            print(f"✓ scale {scale}, run {run + 1}/{repeat}")
+    finally:
+        os.chdir(cwd)
+    return records
+
+
+# ------------------------------------------------
+# 2. Results
+# ------------------------------------------------
+def summarize(records):
+    # Best of the repeated runs per (scale, stage)
+    frame = pd.DataFrame(records)
+    return (frame.groupby(["scale", "stage"], sort=False)
+            .agg(rows=("rows", "max"), wall_s=("wall_s", "min"), cpu_s=("cpu_s", "min"),
+                 peak_rss_mb=("peak_rss_mb", "max"))
+            .reset_index())
+
+
+def save_results(records, args):
+    commit, dirty = git_commit()
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{commit[:12]}{'-dirty' if dirty else ''}.json"
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scales": args.scale,
+        "repeat": args.repeat,
+        "records": records,
+        "summary": summarize(records).to_dict("records"),
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def load_summary(path):
+    with open(path) as f:
+        return pd.DataFrame(json.load(f)["summary"])
+
+
+def compare(base_path, head_path):
+    base, head = load_summary(base_path), load_summary(head_path)
+    table = base.merge(head, on=["scale", "stage"], how="outer", suffixes=("_base", "_head"))
+    table["ratio"] = table["wall_s_head"] / table["wall_s_base"]
+    table["regression"] = table["ratio"] > REGRESSION_RATIO
+    columns = ["scale", "stage", "rows_head", "wall_s_base", "wall_s_head", "ratio", "regression"]
+    print(table[columns].to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    return int(table["regression"].sum())
+
+
+def latest_result():
+    paths = sorted(RESULTS_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime)
+    return paths[-1] if paths else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the aquaculture suitability scripts")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 100],
+                        help="input scales relative to the real data (default 1 10 100)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scale; the best is kept")
+    parser.add_argument("--no-dashboards", action="store_true", help="skip the folium dashboards")
+    parser.add_argument("--regenerate", action="store_true", help="rewrite the synthetic inputs")
+    parser.add_argument("--compare", nargs="+", metavar="RESULT",
+                        help="compare BASE.json with HEAD.json (default: the newest result)")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        head = args.compare[1] if len(args.compare) > 1 else latest_result()
+        regressions = compare(args.compare[0], head)
+        print(f"{regressions} stage(s) slower than {REGRESSION_RATIO}x")
+        sys.exit(1 if regressions else 0)
+
+    records = []
+    for scale in args.scale:
+        records += run_scale(scale, args.repeat, not args.no_dashboards, args.regenerate)
+    print(summarize(records).to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    print(f"✅ Benchmark results saved to {save_results(records, args)}")
+
+
+if __name__ == "__main__":
+    main()
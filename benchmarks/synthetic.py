@@ -0,0 +1,196 @@
+# ================================================================
+# synthetic.py
+# Synthetic, realistically shaped inputs at any scale
+# ================================================================
+# write_inputs(root, scale) fills root/data_raw with every file that
+# full_pipeline.py and the dashboards read, under the same names, plus
+# root/reports/ (NOAA-style report texts for parse_state_texts.py) and a
+# parsed report CSV for regulatory_scoring.py. Scale 1 is roughly the
+# size of the real inputs; the row, polygon and vertex counts of every
+# layer grow linearly with scale:
+#
+#   states        50 named states as Voronoi cells over CONUS; borders
+#                 are wiggly, shared exactly by neighbours, and carry
+#                 ~200 * scale vertices per state
+#   nfhap         200 * scale polygons, STATES = 1-3 space-separated
+#                 abbreviations
+#   czma          a coastal band around the state union cut into
+#                 10 * scale domains
+#   sanctuaries   5 * scale discs on the coast
+#   ports         1000 * scale points, half in CONUS, half worldwide
+#   reports       every state section repeated scale times
+#   scored csv    50 * scale parsed report rows
+# ================================================================
+
+import json
+import random
+import sys
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import full_pipeline as fp  # noqa: E402
+from parse_state_texts import ALL_US_STATES, FEE_COL, LAW_COL, SECTION_HEADERS, TIME_COL  # noqa: E402
+from regions import US_STATES  # noqa: E402
+
+CONUS = (-125.0, 24.0, -66.0, 49.0)
+ABBREV = dict(zip(ALL_US_STATES, US_STATES.abbrevs_of(US_STATES.codes(ALL_US_STATES))))
+REPORT_NAMES = {
+    "finfish": "Report-State-by-State-Summary-of-Finfish-Aquaculture-Leasing-Permitting-Requirements-2021.txt",
+    "shellfish": "Report-State-by-State-Summary-of-Shellfish-Aquaculture-Leasing-Permitting-Requirements-2021.txt",
+    "algae": "Report-State-by-State-Summary-of-Seaweed-Aquaculture-Leasing-Permitting-Requirements-2021.txt",
+}
+SCORED_CSV = "benchmark_parsed.csv"
+
+
+def _uniform_points(rng, n, bounds=CONUS):
+    return np.column_stack([rng.uniform(bounds[0], bounds[2], n), rng.uniform(bounds[1], bounds[3], n)])
+
+
+# ------------------------------------------------
+# 1. Spatial layers
+# ------------------------------------------------
+def states_layer(rng, scale):
+    seeds = shapely.multipoints(_uniform_points(rng, len(ALL_US_STATES)))
+    cells = shapely.get_parts(shapely.voronoi_polygons(seeds, extend_to=shapely.box(*CONUS)))
+    cells = shapely.clip_by_rect(cells, *CONUS)
+    # Densify, then displace every vertex by a function of its position,
+    # so shared borders stay identical on both sides
+    perimeter = shapely.length(cells).mean()
+    cells = shapely.segmentize(cells, perimeter / (200 * scale))
+    cells = shapely.make_valid(shapely.transform(cells, lambda c: c + 0.15 * np.sin(c[:, ::-1] * 3.7)))
+    return gpd.GeoDataFrame({"NAME": ALL_US_STATES}, geometry=cells, crs="EPSG:4326")
+
+
+def nfhap_layer(rng, scale):
+    n = 200 * scale
+    polys = shapely.buffer(shapely.points(_uniform_points(rng, n)), rng.uniform(0.05, 0.4, n), quad_segs=4)
+    abbrevs = np.array(list(ABBREV.values()))
+    states = [" ".join(rng.choice(abbrevs, rng.integers(1, 4), replace=False)) for _ in range(n)]
+    return gpd.GeoDataFrame({"STATES": states, "NFHAP_SCOR": rng.uniform(0, 5, n), "HUC12": np.arange(n)},
+                            geometry=polys, crs="EPSG:4326")
+
+
+def coast_line(states):
+    return shapely.boundary(shapely.union_all(np.asarray(states.geometry, dtype=object)))
+
+
+def czma_layer(rng, states, scale):
+    coast = coast_line(states)
+    band = shapely.intersection(shapely.buffer(coast, 0.75), shapely.box(*CONUS))
+    edges = np.linspace(CONUS[0], CONUS[2], 10 * scale + 1)
+    pieces = shapely.intersection(band, shapely.box(edges[:-1], CONUS[1], edges[1:], CONUS[3]))
+    pieces = pieces[~shapely.is_empty(pieces)]
+    return gpd.GeoDataFrame({"CZMADomain": [f"Domain {i}" for i in range(len(pieces))]},
+                            geometry=pieces, crs="EPSG:4326")
+
+
+def sanctuaries_layer(rng, states, scale):
+    coast = coast_line(states)
+    n = 5 * scale
+    centres = shapely.line_interpolate_point(coast, rng.uniform(0, 1, n), normalized=True)
+    discs = shapely.buffer(centres, rng.uniform(0.1, 0.5, n))
+    return gpd.GeoDataFrame({"siteName": [f"Sanctuary {i}" for i in range(n)]}, geometry=discs, crs="EPSG:4326")
+
+
+def ports_layer(rng, scale):
+    n = 1000 * scale
+    xy = np.vstack([_uniform_points(rng, n // 2), _uniform_points(rng, n - n // 2, (-180, -60, 180, 70))])
+    return gpd.GeoDataFrame({"name": [f"Port {i}" for i in range(n)], "featurecla": "Port"},
+                            geometry=shapely.points(xy), crs="EPSG:4326")
+
+
+# ------------------------------------------------
+# 2. Tabular inputs
+# ------------------------------------------------
+def tabular_inputs(rng, scale):
+    n = len(ALL_US_STATES)
+    files = {
+        fp.PRODUCTION_FILES["acres"]: pd.DataFrame({"State": ALL_US_STATES,
+                                                    "Total_Acres_Saltwater": rng.uniform(0, 5000, n),
+                                                    "Total_Acres_Freshwater": rng.uniform(0, 5000, n)}),
+        fp.PRODUCTION_FILES["value"]: pd.DataFrame({"State": ALL_US_STATES,
+                                                    "Total_Sales_$1000": rng.uniform(0, 1e5, n)}),
+        fp.PRODUCTION_FILES["farms"]: pd.DataFrame({"State": ALL_US_STATES,
+                                                    "Number of Aquaculture Farms (2023)": rng.integers(0, 500, n)}),
+        fp.PRODUCTION_FILES["sales"]: pd.DataFrame({"State": ALL_US_STATES,
+                                                    "Sales": rng.integers(0, 1000, n)}),
+        fp.PROGRAMS_FILE: pd.DataFrame({"state": rng.choice(ALL_US_STATES, 50 * scale),
+                                        "program": [f"Program {i}" for i in range(50 * scale)]}),
+    }
+    for path in fp.REGULATORY_FILES:
+        files[path] = pd.DataFrame({"state": ALL_US_STATES, "regulatory_access_score": rng.uniform(0, 1, n)})
+    return files
+
+
+def parsed_reports(rng, scale):
+    # The table parse_state_texts.py produces, scale copies of the states
+    n = 50 * scale
+    laws = rng.choice(["YES", "NO", "N/A"], n, p=[0.6, 0.2, 0.2])
+    fees = np.where(rng.random(n) < 0.2, "N/A",
+                    np.where(rng.random(n) < 0.2, "No", rng.integers(0, 5000, n).astype(float).astype(str)))
+    times = [
+        "N/A" if r < 0.25 else "; ".join(f"{rng.integers(1, 24)} months" if rng.random() < 0.6
+                                         else f"{rng.integers(1, 4)}.5 years" for _ in range(rng.integers(1, 4)))
+        for r in rng.random(n)
+    ]
+    return pd.DataFrame({"state": np.resize(ALL_US_STATES, n), LAW_COL: laws, FEE_COL: fees, TIME_COL: times})
+
+
+def report_text(report_type, scale, seed=0):
+    r = random.Random(seed)
+    out = ["State-by-State Summary of Aquaculture Leasing/Permitting Requirements\n"]
+    for _ in range(scale):
+        for state in ALL_US_STATES:
+            out.append(f"{state}\n{SECTION_HEADERS[report_type]}\n")
+            lines = ["Overview of the state program.", "State leasing/permitting law(s):",
+                     "have not been developed" if r.random() < 0.3 else f"Statute {r.randint(1, 999)}"]
+            for _ in range(r.randint(5, 40)):
+                c = r.random()
+                if c < 0.05:
+                    lines.append("Application Fees")
+                elif c < 0.2:
+                    lines.append(f"Application fee of ${r.randint(1, 5000):,} plus ${r.randint(1, 99)}.50 per acre")
+                elif c < 0.25:
+                    lines.append("Lease Review/Approval Timeframe")
+                elif c < 0.4:
+                    lines.append(f"Review takes about {r.randint(1, 24)} months or {r.randint(1, 3)}.5 years")
+                else:
+                    lines.append("Applicants consult the state agency and local stakeholders before submitting.")
+            out.append("\n".join(lines) + "\n")
+    return "".join(out)
+
+
+# ------------------------------------------------
+# 3. Write a workspace
+# ------------------------------------------------
+def write_inputs(root, scale, seed=0):
+    # root/data_raw, root/reports and root/scripts (the working directory
+    # the repo scripts expect, since they use ../data_raw)
+    root = Path(root)
+    raw = root / "data_raw"
+    for d in (raw, root / "reports", root / "scripts", root / "data_processed"):
+        d.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    states = states_layer(rng, scale)
+    states.to_file(raw / fp.STATES_FILE.name, driver="GeoJSON")
+    nfhap_layer(rng, scale).to_file(raw / fp.NFHAP_FILE.name)
+    czma_layer(rng, states, scale).to_file(raw / fp.CZMA_FILE.name, driver="GPKG")
+    sanctuaries_layer(rng, states, scale).to_file(raw / fp.SANCTUARY_FILE.name, driver="GPKG")
+    ports_layer(rng, scale).to_file(raw / fp.PORTS_FILE.name)
+    for path, frame in tabular_inputs(rng, scale).items():
+        frame.to_csv(raw / Path(path).name, index=False)
+
+    parsed_reports(rng, scale).to_csv(root / "reports" / SCORED_CSV, index=False)
+    for i, (report_type, name) in enumerate(REPORT_NAMES.items()):
+        (root / "reports" / name).write_text(report_text(report_type, scale, seed + i), encoding="utf-8")
+    # Written last, so an interrupted generation is redone
+    (root / "inputs.json").write_text(json.dumps({"scale": scale, "seed": seed}))
+    return root
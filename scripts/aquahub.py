@@ -0,0 +1,122 @@
+# ================================================================
+# aquahub.py
+# Single fast-start entry point for the aquaculture hub scripts
+# ================================================================
+# Only argparse is imported up front; each subcommand imports its own
+# module (and with it pandas / geopandas / folium) when it runs.
+# Subcommand help is printed from the usage strings in COMMANDS, so
+# `--help` and argument errors return immediately. The pipeline runs
+# headless by default and never imports matplotlib unless --plot is
+# given. --import-time reports on stderr how long the subcommand's
+# imports took; the folium dashboards build their map while being
+# imported, so for them it reports the build time instead.
+#
+# Usage (from scripts/):
+#   python aquahub.py parse <algae|finfish|shellfish> report.txt
+#   python aquahub.py parse --batch combined.csv report1.txt ...
+#   python aquahub.py score report_parsed.csv [out.csv]
+#   python aquahub.py pipeline [--plot] [full_pipeline.py options]
+#   python aquahub.py dashboard [--full | --tiles]
+#   python aquahub.py serve [--port 8765]
+# ================================================================
+
+import argparse
+import sys
+import time
+
+PIPELINE_USAGE = """aquahub pipeline [--plot] [--force STAGE] [--workers N] [--grid {square,hex}]
+                        [--cell-km CELL_KM] [--nfhap-weight {mean,area}]
+                        [--normalize {minmax,zscore,rank,robust,log}]
+                        [--profile [--cprofile] [--tracemalloc]]
+
+  --plot                show the final plot (headless otherwise)
+  --force STAGE         recompute STAGE even if cached ('all' for every stage)
+  --workers N           run independent stages in a pool of N processes
+  --grid {square,hex}   also score square or hex cells covering the coastal zone
+  --cell-km CELL_KM     grid cell size: side of an equal-area cell in km (default 10)
+  --nfhap-weight {mean,area}
+                        NFHAP score per state: mean over tagged polygons (default) or
+                        weighted by clipped area inside each state
+  --normalize {minmax,zscore,rank,robust,log}
+                        factor normalization strategy (default minmax)
+  --profile             record time, memory and rows per stage (data_processed/profile/)
+  --cprofile            with --profile, also dump a cProfile per stage
+  --tracemalloc         with --profile, also record peak Python allocations per stage"""
+DASHBOARD_USAGE = """aquahub dashboard            lightweight dashboard
+       aquahub dashboard --full     full-resolution dashboard
+       aquahub dashboard --tiles [--out-dir OUT_DIR] [--min-zoom 2] [--max-zoom 10]
+                                    PMTiles vector tiles and viewer (vector_tiles.py)"""
+SERVE_USAGE = """aquahub serve [--host HOST] [--port PORT] [--cache N]
+
+  --host HOST  address to bind (default 127.0.0.1)
+  --port PORT  port (default 8765)
+  --cache N    weight scenarios kept in the LRU cache (default 256)"""
+
+# Help is answered from these strings, so it never imports the subcommand
+COMMANDS = {
+    "parse": ("parse_state_texts", "parse NOAA state-by-state report text into CSV",
+              "aquahub parse <algae|finfish|shellfish> report.txt\n"
+              "       aquahub parse --batch combined.csv report1.txt report2.txt ..."),
+    "score": ("regulatory_scoring", "score a parsed report CSV",
+              "aquahub score report_parsed.csv [out.csv]"),
+    "pipeline": ("full_pipeline", "run the suitability pipeline (headless unless --plot)", PIPELINE_USAGE),
+    "dashboard": (None, "build the dashboard (--full, or --tiles [vector_tiles.py options])", DASHBOARD_USAGE),
+    "serve": ("query_service", "answer suitability queries over HTTP on localhost", SERVE_USAGE),
+}
+# Subcommands that do nothing useful without arguments print their usage instead
+ARGS_REQUIRED = ("parse", "score")
+HELP = ("-h", "--help")
+
+
+def timed_import(module_name, report=False, label="import"):
+    start = time.perf_counter()
+    module = __import__(module_name)
+    if report:
+        print(f"⏱ {label} {module_name}: {time.perf_counter() - start:.2f} s", file=sys.stderr)
+    return module
+
+
+def run_dashboard(rest, report):
+    # The folium dashboards build the map at module level, so importing runs them
+    # (and is reported as build time)
+    if "--tiles" in rest:
+        rest.remove("--tiles")
+        timed_import("vector_tiles", report).main(rest)
+    else:
+        timed_import("folium", report)
+        timed_import("interactive_visualization" if "--full" in rest else "interactive_visualization_smaller",
+                     report, label="build")
+
+
+def main(argv=None):
+    commands = "\n".join(f"  {name:<10} {help_text}" for name, (_, help_text, _) in COMMANDS.items())
+    parser = argparse.ArgumentParser(
+        prog="aquahub", description="Aquaculture suitability hub tools",
+        formatter_class=argparse.RawDescriptionHelpFormatter, epilog="commands:\n" + commands)
+    parser.add_argument("--import-time", action="store_true",
+                        help="report subcommand import time on stderr (build time for dashboards)")
+    parser.add_argument("command", choices=COMMANDS, metavar="COMMAND")
+    # Everything after the command is handed to that command untouched
+    parser.add_argument("args", nargs=argparse.REMAINDER, metavar="...")
+    args = parser.parse_args(argv)
+    module_name, _, usage = COMMANDS[args.command]
+    rest = list(args.args)
+
+    if set(HELP) & set(rest) or (not rest and args.command in ARGS_REQUIRED):
+        print("usage: " + usage)
+        return
+    if args.command == "dashboard":
+        run_dashboard(rest, args.import_time)
+        return
+    if args.command == "pipeline":
+        if "--plot" in rest:
+            rest.remove("--plot")
+        else:
+            rest.insert(0, "--headless")
+
+    module = timed_import(module_name, args.import_time)
+    module.main(rest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# ================================================================
+# factor_store.py
+# Columnar GeoParquet store for pipeline outputs and display layers
+# ================================================================
+# data_processed/factor_store/ holds one GeoParquet table per layer:
+#
+#   suitability   every raw and normalized factor plus SuitabilityIndex,
+#                 written by full_pipeline.py section 11
+#   ports, czma,  the raw layers, reprojected once to STORE_CRS and
+#   sanctuaries   refreshed only when their source files change; only
+#                 the RAW_LAYER_READS columns are read (raw_layers.py)
+#
+# Every table carries bbox_minx/miny/maxx/maxy columns and is sorted
+# into spatially coherent row groups. read_table(columns=..., bbox=...)
+# is then answered with Parquet column pruning and row-group statistics
+# instead of reading, filtering and reprojecting whole files.
+# geopandas (and stage_graph, which needs it) is only imported by the
+# functions that use it, so callers that merely locate or patch tables
+# (incremental.py, query_service.py) start quickly.
+#
+# Usage:
+#   python factor_store.py            (lists the tables in the store)
+# ================================================================
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+data_dir = Path("../data_raw")
+out_dir = Path("../data_processed")
+STORE_DIR = out_dir / "factor_store"
+
+# Web maps want longitude/latitude
+STORE_CRS = "EPSG:4326"
+BBOX_COLUMNS = ["bbox_minx", "bbox_miny", "bbox_maxx", "bbox_maxy"]
+ROW_GROUP_SIZE = 4096
+
+RAW_LAYERS = {
+    "ports": data_dir / "ne_10m_ports.shp",
+    "czma": data_dir / "CoastalZoneManagementAct.gpkg",
+    "sanctuaries": data_dir / "NationalMarineSanctuary.gpkg",
+}
+# Attribute columns the maps show, and a lon/lat bbox pushed into the read.
+# Ports stay global: the states layer reaches across the antimeridian
+# (Guam, American Samoa, the Aleutians), so no lon/lat box fits it
+RAW_LAYER_READS = {
+    "ports": {"columns": ["name"], "bbox": None},
+    "czma": {"columns": ["CZMADomain"], "bbox": None},
+    "sanctuaries": {"columns": ["siteName"], "bbox": None},
+}
+
+
+def table_path(name, store_dir=STORE_DIR):
+    return Path(store_dir) / f"{name}.parquet"
+
+
+def _read_manifest(store_dir):
+    path = Path(store_dir) / "manifest.json"
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def _write_manifest(store_dir, manifest):
+    path = Path(store_dir) / "manifest.json"
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def source_key(sources, options=None):
+    from stage_graph import expand_inputs
+    stamp = [(p.name, p.stat().st_size, p.stat().st_mtime_ns) for p in expand_inputs(sources)]
+    if options is not None:
+        stamp = [stamp, options]
+    return hashlib.sha256(json.dumps(stamp).encode()).hexdigest()[:16]
+
+
+# ------------------------------------------------
+# 1. Write
+# ------------------------------------------------
+def write_table(name, gdf, key=None, store_dir=STORE_DIR):
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    gdf = gdf.to_crs(STORE_CRS).drop(columns=BBOX_COLUMNS, errors="ignore")
+
+    bounds = gdf.geometry.bounds.to_numpy()
+    for i, col in enumerate(BBOX_COLUMNS):
+        gdf[col] = bounds[:, i]
+    # One-degree latitude bands, west to east within a band, so each row
+    # group covers a compact area and bbox filters can skip most of them
+    order = np.lexsort((bounds[:, 0], np.floor(bounds[:, 1])))
+    gdf = gdf.iloc[order].reset_index(drop=True)
+
+    gdf.to_parquet(table_path(name, store_dir), index=False, row_group_size=ROW_GROUP_SIZE)
+    manifest = _read_manifest(store_dir)
+    manifest[name] = {"key": key, "rows": len(gdf), "columns": [c for c in gdf.columns if c not in BBOX_COLUMNS]}
+    _write_manifest(store_dir, manifest)
+
+
+# ------------------------------------------------
+# 2. Read
+# ------------------------------------------------
+def bbox_filters(bbox):
+    # Rows whose bounding box intersects (minx, miny, maxx, maxy)
+    minx, miny, maxx, maxy = bbox
+    return [("bbox_maxx", ">=", minx), ("bbox_minx", "<=", maxx),
+            ("bbox_maxy", ">=", miny), ("bbox_miny", "<=", maxy)]
+
+
+def read_table(name, columns=None, filters=None, bbox=None, store_dir=STORE_DIR):
+    # columns: attribute columns to read (geometry is always included);
+    # filters: pyarrow-style [(column, op, value), ...] pushed down to Parquet
+    path = table_path(name, store_dir)
+    if columns is not None:
+        columns = [c for c in columns if c != "geometry"] + ["geometry"]
+    filters = list(filters or []) + (bbox_filters(bbox) if bbox is not None else [])
+    import geopandas as gpd
+    gdf = gpd.read_parquet(path, columns=columns, filters=filters or None)
+    return gdf.drop(columns=BBOX_COLUMNS, errors="ignore")
+
+
+def load_layer(name, columns=None, filters=None, bbox=None, store_dir=STORE_DIR):
+    # Raw layers are reprojected into the store on first use and whenever
+    # their source files change
+    source, options = RAW_LAYERS[name], RAW_LAYER_READS[name]
+    key = source_key([source], options)
+    if _read_manifest(store_dir).get(name, {}).get("key") != key:
+        from raw_layers import read_layer
+        write_table(name, read_layer(source, **options), key=key, store_dir=store_dir)
+    return read_table(name, columns, filters, bbox, store_dir)
+
+
+if __name__ == "__main__":
+    for name, info in sorted(_read_manifest(STORE_DIR).items()):
+        print(f"  {name}: {info['rows']} rows, {len(info['columns'])} columns")
+    print(f"✅ Factor store at {STORE_DIR}")
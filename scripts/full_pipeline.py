@@ -6,218 +6,453 @@
 # Purpose: Combine regulatory, environmental, economic, and infrastructure
 #          datasets into a composite Aquaculture Suitability Index
 # ================================================================
+# Each numbered section is a named stage (see stage_graph.py). Stage
+# outputs are cached in data_processed/stages/ and keyed by a hash of
+# their input files, parameters, code and upstream stages, so a re-run only
+# recomputes what is stale. Use --force STAGE (or --force all) to
+# recompute regardless of the cache. --workers N runs the independent
+# loaders and spatial joins (sections 3-8) in a process pool and feeds
+# their outputs into the section-9 merge. --grid square|hex additionally
+# scores equal-area cells of --cell-km across the coastal zone,
+# --nfhap-weight area weights the NFHAP score by clipped area,
+# --normalize picks the factor scaling (section 9b), and --headless
+# skips the closing plot for cron / CI runs. --profile records time,
+# memory and row counts per stage (see profiling.py). Raw spatial layers
+# are read through raw_layers.py: only the columns a stage uses, only
+# features near the states, reprojected once and cached.
+# ================================================================
 # %%
 
+import argparse
 import os
+from dataclasses import replace
 from pathlib import Path
-import geopandas as gpd
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+
+from factor_store import write_table
+from index_engine import INDEX_WEIGHTS, score_frame
+from normalization import STRATEGIES, fit, normalize_columns, save_stats
+from grid import SHAPES, grid_factors
+from overlay import EQUAL_AREA_CRS, OverlayLayer, clip_pairs, clipped_measure, geometry_array, open_area_km2
+from port_distance import load_port_index
+from profiling import StageProfiler
+from raw_layers import cached_layer, read_attributes, read_chunks, read_layer
+from regions import US_STATES, FactorMatrix
+from stage_graph import Stage, StageCache, run_stages
 
 # ------------------------------------------------
 # 1. File paths
 # ------------------------------------------------
 data_dir = Path("../data_raw")
 out_dir = Path("../data_processed")
-out_dir.mkdir(exist_ok=True)
+stage_dir = out_dir / "stages"
+
+STATES_FILE = data_dir / "us_states.geojson"
+REGULATORY_FILES = [
+    data_dir / "Report-State-by-State-Summary-of-Finfish-Aquaculture-Leasing-Permitting-Requirements-2021_parsed_scored.csv",
+    data_dir / "Report-State-by-State-Summary-of-Shellfish-Aquaculture-Leasing-Permitting-Requirements-2021_parsed_scored.csv",
+    data_dir / "Report-State-by-State-Summary-of-Seaweed-Aquaculture-Leasing-Permitting-Requirements-2021_parsed_scored.csv",
+]
+PRODUCTION_FILES = {
+    "acres": data_dir / "aquaculture_production_acres.csv",
+    "value": data_dir / "aquaculture_product_value.csv",
+    "farms": data_dir / "aquaculture-farms-in-the-united-states-2023.csv",
+    "sales": data_dir / "aquaculture-sales-in-the-united-states-2023.csv",
+}
+PROGRAMS_FILE = data_dir / "aquaculture_programs.csv"
+NFHAP_FILE = data_dir / "nfhap_coastal_final_Pwm.shp"
+CZMA_FILE = data_dir / "CoastalZoneManagementAct.gpkg"
+SANCTUARY_FILE = data_dir / "NationalMarineSanctuary.gpkg"
+PORTS_FILE = data_dir / "ne_10m_ports.shp"
 # %%
 
 # ------------------------------------------------
 # 2. Load base spatial layer (U.S. states)
 # ------------------------------------------------
-states = gpd.read_file(data_dir / "us_states.geojson")
-states = states.rename(columns={"NAME": "state", "name": "state"})
-states = states[["state", "geometry"]]
-states['state'] = states['state'].str.title().str.strip()
+def load_states():
+    states = read_layer(STATES_FILE, columns=["NAME", "name"])
+    states = states.rename(columns={"NAME": "state", "name": "state"})
+    states = states[["state", "geometry"]]
+    states['state'] = US_STATES.canonical(states['state'])
+    return states
 # %%
 
 # ------------------------------------------------
 # 3. Load NOAA regulatory accessibility data
 # ------------------------------------------------
-finfish = pd.read_csv(data_dir / "Report-State-by-State-Summary-of-Finfish-Aquaculture-Leasing-Permitting-Requirements-2021_parsed_scored.csv")
-shellfish = pd.read_csv(data_dir / "Report-State-by-State-Summary-of-Shellfish-Aquaculture-Leasing-Permitting-Requirements-2021_parsed_scored.csv")
-seaweed = pd.read_csv(data_dir / "Report-State-by-State-Summary-of-Seaweed-Aquaculture-Leasing-Permitting-Requirements-2021_parsed_scored.csv")
+def regulatory_stage():
+    finfish, shellfish, seaweed = [pd.read_csv(f) for f in REGULATORY_FILES]
 
-perm_df = pd.concat([
-    finfish[["state", "regulatory_access_score"]],
-    shellfish[["state", "regulatory_access_score"]],
-    seaweed[["state", "regulatory_access_score"]]
-])
+    perm_df = pd.concat([
+        finfish[["state", "regulatory_access_score"]],
+        shellfish[["state", "regulatory_access_score"]],
+        seaweed[["state", "regulatory_access_score"]]
+    ])
 
-perm_mean = perm_df.groupby("state", as_index=False)["regulatory_access_score"].mean()
-perm_mean['perm_norm'] = (perm_mean['regulatory_access_score'] - perm_mean['regulatory_access_score'].min()) / \
-                         (perm_mean['regulatory_access_score'].max() - perm_mean['regulatory_access_score'].min())
+    return perm_df.groupby("state", as_index=False)["regulatory_access_score"].mean()
 # %%
 # ------------------------------------------------
 # 4. Load industry / production data (USDA & ERS)
 # ------------------------------------------------
-prod_acres = pd.read_csv(data_dir / "aquaculture_production_acres.csv")
-prod_value = pd.read_csv(data_dir / "aquaculture_product_value.csv")
-prod_farms = pd.read_csv(data_dir / "aquaculture-farms-in-the-united-states-2023.csv")
-prod_sales = pd.read_csv(data_dir / "aquaculture-sales-in-the-united-states-2023.csv")
-
-for df in [prod_acres, prod_value, prod_farms, prod_sales]:
-    # Standardize column names
-    df.columns = [c.lower().strip() for c in df.columns]
-    
-    # Ensure there is a 'state' column
-    if "state" not in df.columns:
-        df.rename(columns={df.columns[0]: "state"}, inplace=True)
-    
-    # Convert all numeric columns to floats and normalize safely
-    for c in df.columns:
-        if c != "state":
-            df[c] = pd.to_numeric(df[c], errors='coerce')  # convert non-numeric to NaN
-            # Handle case where min=max to avoid division by zero
-            if df[c].max() != df[c].min():
-                df[c + "_norm"] = (df[c] - df[c].min()) / (df[c].max() - df[c].min())
-            else:
-                df[c + "_norm"] = 0  # or 1, depending on how you want to handle this
+PRODUCTION_COLUMNS = {
+    "farms": "number of aquaculture farms (2023)",
+    "value": "total_sales_$1000",
+    "acres": "total_acres_saltwater",
+}
+
+
+def production_stage():
+    # Raw figures, one row per state; only the kept columns are parsed. Each
+    # file is written in by region code (see regions.py), so spellings that
+    # differ between the USDA files still land on the same state
+    production = FactorMatrix(US_STATES, US_STATES.names, PRODUCTION_COLUMNS.values())
+    for key, column in PRODUCTION_COLUMNS.items():
+        df = pd.read_csv(PRODUCTION_FILES[key])
+        # Standardize column names
+        df.columns = [c.lower().strip() for c in df.columns]
+
+        # Ensure there is a 'state' column
+        if "state" not in df.columns:
+            df = df.rename(columns={df.columns[0]: "state"})
+
+        values = pd.to_numeric(df[column], errors='coerce')  # convert non-numeric to NaN
+        production.fill(key, df["state"], values.to_frame(column))
+    for line in production.report():
+        print(line)
+    production = production.join(pd.DataFrame({"state": US_STATES.names}))
+    # Drop the regions none of the files mention
+    return production.dropna(how="all", subset=list(PRODUCTION_COLUMNS.values())).reset_index(drop=True)
 # %%
 # ------------------------------------------------
 # 5. Load education / workforce data (IPEDS)
 # ------------------------------------------------
-programs = pd.read_csv(data_dir / "aquaculture_programs.csv")
-if "state" in programs.columns:
-    program_density = programs.groupby("state", as_index=False).size()
-    program_density.columns = ["state", "program_count"]
-else:
-    program_density = pd.DataFrame(columns=["state", "program_count"])
-
-program_density['program_norm'] = (program_density['program_count'] - program_density['program_count'].min()) / \
-                                  (program_density['program_count'].max() - program_density['program_count'].min())
+def programs_stage():
+    programs = pd.read_csv(PROGRAMS_FILE)
+    if "state" in programs.columns:
+        program_density = programs.groupby("state", as_index=False).size()
+        program_density.columns = ["state", "program_count"]
+    else:
+        program_density = pd.DataFrame(columns=["state", "program_count"])
+    return program_density
 # %%
 
 # ------------------------------------------------
 # 6. Environmental quality (NFHAP)
 # ------------------------------------------------
-nfhap = gpd.read_file(data_dir / "nfhap_coastal_final_Pwm.shp")
-nfhap = nfhap.assign(STATES=nfhap['STATES'].str.split())
-nfhap = nfhap.explode('STATES', ignore_index=True)
-
-state_env = nfhap.groupby('STATES', as_index=False)['NFHAP_SCOR'].mean()
-
-us_state_abbrev = {
-    'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas',
-    'CA': 'California', 'CO': 'Colorado', 'CT': 'Connecticut', 'DE': 'Delaware',
-    'FL': 'Florida', 'GA': 'Georgia', 'HI': 'Hawaii', 'ID': 'Idaho',
-    'IL': 'Illinois', 'IN': 'Indiana', 'IA': 'Iowa', 'KS': 'Kansas',
-    'KY': 'Kentucky', 'LA': 'Louisiana', 'ME': 'Maine', 'MD': 'Maryland',
-    'MA': 'Massachusetts', 'MI': 'Michigan', 'MN': 'Minnesota', 'MS': 'Mississippi',
-    'MO': 'Missouri', 'MT': 'Montana', 'NE': 'Nebraska', 'NV': 'Nevada',
-    'NH': 'New Hampshire', 'NJ': 'New Jersey', 'NM': 'New Mexico', 'NY': 'New York',
-    'NC': 'North Carolina', 'ND': 'North Dakota', 'OH': 'Ohio', 'OK': 'Oklahoma',
-    'OR': 'Oregon', 'PA': 'Pennsylvania', 'RI': 'Rhode Island', 'SC': 'South Carolina',
-    'SD': 'South Dakota', 'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah',
-    'VT': 'Vermont', 'VA': 'Virginia', 'WA': 'Washington', 'WV': 'West Virginia',
-    'WI': 'Wisconsin', 'WY': 'Wyoming'
-}
+def membership_means(keys, values):
+    # Mean of ``values`` per token of the space-separated ``keys`` strings, as
+    # if the frame were split and exploded, without building the exploded
+    # frame: values are summed per distinct key string with a bincount, then
+    # spread to tokens through a sparse (distinct string x token) matrix.
+    from scipy.sparse import csr_matrix
+
+    codes, uniques = pd.factorize(keys)
+    values = np.asarray(values, dtype=float)
+    present = (codes >= 0) & ~np.isnan(values)
+    sums = np.bincount(codes[present], weights=values[present], minlength=len(uniques))
+    counts = np.bincount(codes[present], minlength=len(uniques)).astype(float)
+
+    tokens = [str(u).split() for u in uniques]
+    rows = np.repeat(np.arange(len(uniques)), [len(t) for t in tokens])
+    names, cols = np.unique(np.array([tok for t in tokens for tok in t], dtype=object), return_inverse=True)
+    membership = csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(uniques), len(names)))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (membership.T @ sums) / (membership.T @ counts)
+    return pd.Series(means, index=pd.Index(names, name="token"))
+
+
+def nfhap_stage():
+    nfhap = read_attributes(NFHAP_FILE, ['STATES', 'NFHAP_SCOR'])
+    means = membership_means(nfhap['STATES'], nfhap['NFHAP_SCOR'])
 
-state_env['state'] = state_env['STATES'].map(us_state_abbrev)
-state_env.rename(columns={'NFHAP_SCOR': 'EnvQualityIndex'}, inplace=True)
-state_env['EnvQuality_norm'] = (state_env['EnvQualityIndex'] - state_env['EnvQualityIndex'].min()) / \
-                               (state_env['EnvQualityIndex'].max() - state_env['EnvQualityIndex'].min())
+    state_env = pd.DataFrame({'STATES': means.index.to_numpy(), 'EnvQualityIndex': means.to_numpy()})
+    state_env['state'] = US_STATES.names_of(US_STATES.codes(state_env['STATES']))
+    return state_env
+
+
+# --nfhap-weight area: features read per chunk, so only one chunk of
+# full-resolution geometry is in memory at a time
+NFHAP_CHUNK_ROWS = 20000
+NFHAP_WEIGHTS = ("mean", "area")
+
+
+def nfhap_area_stage(states, chunk_rows):
+    # Mean NFHAP_SCOR per state weighted by each feature's clipped area inside
+    # the state (clipped length for line features), in an equal-area CRS.
+    # Membership comes from the geometry rather than the STATES tags, so a
+    # polygon that straddles a border is split between the states it covers.
+    regions = geometry_array(states.to_crs(EQUAL_AREA_CRS))
+    weighted = np.zeros(len(regions))
+    measure = np.zeros(len(regions))
+    for chunk in read_chunks(NFHAP_FILE, ['NFHAP_SCOR'], chunk_rows):
+        chunk = chunk[chunk['NFHAP_SCOR'].notna() & chunk.geometry.notna()]
+        layer = OverlayLayer(geometry_array(chunk.to_crs(EQUAL_AREA_CRS)), simplify=False)
+        region_idx, geom_idx, clipped = clip_pairs(regions, layer)
+        size = clipped_measure(clipped, layer.geoms[geom_idx])
+        score = chunk['NFHAP_SCOR'].to_numpy(dtype=float)[geom_idx]
+        weighted += np.bincount(region_idx, weights=size * score, minlength=len(regions))
+        measure += np.bincount(region_idx, weights=size, minlength=len(regions))
+
+    covered = measure > 0
+    state_env = pd.DataFrame({'state': states['state'].to_numpy()[covered],
+                              'EnvQualityIndex': weighted[covered] / measure[covered]})
+    state_env.insert(0, 'STATES', US_STATES.abbrevs_of(US_STATES.codes(state_env['state'])))
+    return state_env
 # %%
 # ------------------------------------------------
 # 7. Marine protected areas & coastal zone overlap (robust)
 # ------------------------------------------------
-# Load layers
-czma = gpd.read_file(data_dir / "CoastalZoneManagementAct.gpkg").to_crs(states.crs)
-sanctuaries = gpd.read_file(data_dir / "NationalMarineSanctuary.gpkg").to_crs(states.crs)
-
-# Attach state info via spatial join
-czma = gpd.sjoin(czma, states[['state', 'geometry']], how='left', predicate='intersects')
-sanctuaries = gpd.sjoin(sanctuaries, states[['state', 'geometry']], how='left', predicate='intersects')
-
-# Compute area in km²
-czma['czma_area_km2'] = czma.geometry.area / 1e6
-sanctuaries['sanctuary_area_km2'] = sanctuaries.geometry.area / 1e6
-
-# Aggregate area per state
-czma_area_state = czma.groupby('state', as_index=False)['czma_area_km2'].sum()
-sanctuary_area_state = sanctuaries.groupby('state', as_index=False)['sanctuary_area_km2'].sum()
-
-# Compute open coastal area = CZMA area - sanctuary area
-open_coast = czma_area_state.merge(sanctuary_area_state, on='state', how='left')
-open_coast['sanctuary_area_km2'] = open_coast['sanctuary_area_km2'].fillna(0)
-open_coast['OpenCoast_km2'] = open_coast['czma_area_km2'] - open_coast['sanctuary_area_km2']
-
-# Normalize OpenCoast
-if open_coast['OpenCoast_km2'].max() != open_coast['OpenCoast_km2'].min():
-    open_coast['OpenCoast_norm'] = (
-        open_coast['OpenCoast_km2'] - open_coast['OpenCoast_km2'].min()
-    ) / (
-        open_coast['OpenCoast_km2'].max() - open_coast['OpenCoast_km2'].min()
-    )
-else:
-    open_coast['OpenCoast_norm'] = 0
+def coastal_layers(states, files=(CZMA_FILE, SANCTUARY_FILE)):
+    # Geometry only, in an equal-area CRS so areas are in m², and only the
+    # features that reach the states' extent; a feature outside it cannot
+    # intersect any state. The reprojected layers are cached (raw_layers.py).
+    bbox = tuple(states.to_crs("EPSG:4326").total_bounds)
+    return [cached_layer(f, columns=[], bbox=bbox, crs=EQUAL_AREA_CRS) for f in files]
+
+
+def open_coast_stage(states):
+    regions = geometry_array(states.to_crs(EQUAL_AREA_CRS))
+    czma, sanctuaries = map(geometry_array, coastal_layers(states))
 
-# Keep only relevant columns for merging
-open_coast = open_coast[['state', 'OpenCoast_km2', 'OpenCoast_norm']]
+    # Clip CZMA and sanctuary polygons to each state (STRtree candidate pairs),
+    # union the sanctuaries per state and subtract them from the CZMA union
+    areas = open_area_km2(regions, czma, sanctuaries)
 
+    # Open coastal area = CZMA area - sanctuary area, for states with CZMA coverage
+    open_coast = pd.DataFrame({
+        'state': states['state'].to_numpy(),
+        'czma_area_km2': areas['cover_km2'],
+        'sanctuary_area_km2': areas['exclude_km2'],
+        'OpenCoast_km2': areas['open_km2'],
+    })[areas['has_cover']].reset_index(drop=True)
+
+    # Keep only relevant columns for merging
+    return open_coast[['state', 'OpenCoast_km2']]
 # %%
 
 # ------------------------------------------------
 # 8. Port accessibility (infrastructure)
 # ------------------------------------------------
-ports = gpd.read_file(data_dir / "ne_10m_ports.shp").to_crs(states.crs)
-ports_in_states = gpd.sjoin(ports, states, how='inner', predicate='within')
-port_counts = ports_in_states.groupby('state', as_index=False).size()
-port_counts.columns = ['state', 'port_count']
-port_counts['port_norm'] = (port_counts['port_count'] - port_counts['port_count'].min()) / \
-                           (port_counts['port_count'].max() - port_counts['port_count'].min())
+PORT_NEIGHBOURS = 3
+
+
+def ports_stage(states, k):
+    # Mean great-circle distance from each state's representative point to
+    # its k nearest ports (KD-tree, cached on disk); closer = more accessible
+    ports = load_port_index(PORTS_FILE)
+    points = states.to_crs("EPSG:4326").representative_point()
+    dist, _ = ports.query(points.x, points.y, k=k)
+    return pd.DataFrame({'state': states['state'].to_numpy(), 'port_dist_km': dist.mean(axis=1)})
 # %%
 
 # ------------------------------------------------
 # 9. Merge all datasets
 # ------------------------------------------------
-merged = (
-    states
-    .merge(state_env[['state', 'EnvQuality_norm']], on='state', how='left')
-    .merge(perm_mean[['state', 'perm_norm']], on='state', how='left')
-    .merge(prod_farms[['state', 'number of aquaculture farms (2023)_norm']], on='state', how='left')
-    .merge(prod_value[['state', 'total_sales_$1000_norm']], on='state', how='left')
-    .merge(prod_acres[['state', 'total_acres_saltwater_norm']], on='state', how='left')
-    .merge(program_density[['state', 'program_norm']], on='state', how='left')
-    .merge(open_coast[['state', 'OpenCoast_norm']], on='state', how='left')
-    .merge(port_counts[['state', 'port_norm']], on='state', how='left')
-)
+MERGED_FACTORS = ['EnvQualityIndex', 'regulatory_access_score', *PRODUCTION_COLUMNS.values(),
+                  'program_count', 'OpenCoast_km2', 'port_dist_km']
+
+
+def merge_stage(states, state_env, perm_mean, production, program_density, open_coast, port_access):
+    # Each factor table is written into one (states x factors) matrix by
+    # region code (see regions.py); names, abbreviations and FIPS all match
+    factors = FactorMatrix(US_STATES, states['state'], MERGED_FACTORS)
+    factors.fill("nfhap", state_env['STATES'], state_env[['EnvQualityIndex']])
+    factors.fill("regulatory", perm_mean['state'], perm_mean[['regulatory_access_score']])
+    factors.fill("production", production['state'], production[list(PRODUCTION_COLUMNS.values())])
+    factors.fill("programs", program_density['state'], program_density[['program_count']])
+    factors.fill("open_coast", open_coast['state'], open_coast[['OpenCoast_km2']])
+    factors.fill("ports", port_access['state'], port_access[['port_dist_km']])
+    for line in factors.report():
+        print(line)
+    return factors.join(states)
+# %%
+
+# ------------------------------------------------
+# 9b. Normalize the factors the index uses
+# ------------------------------------------------
+# Raw factor -> normalized column; ports are inverted (closer = more accessible)
+FACTOR_COLUMNS = {
+    "EnvQualityIndex": "EnvQuality_norm",
+    "regulatory_access_score": "perm_norm",
+    "total_sales_$1000": "total_sales_$1000_norm",
+    "program_count": "program_norm",
+    "OpenCoast_km2": "OpenCoast_norm",
+    "port_dist_km": "port_norm",
+}
+INVERTED_FACTORS = ["port_dist_km"]
+NORMALIZATION_FILE = out_dir / "normalization.json"
+
+
+def index_factors(weights):
+    return {raw: norm for raw, norm in FACTOR_COLUMNS.items() if norm in weights}
+
+
+def factor_stats(merged, strategy, factors):
+    # Fitted over the states in the merged table (see normalization.py)
+    return fit(merged[list(factors)].to_numpy(dtype=float), strategy, list(factors), INVERTED_FACTORS)
+
+
+def normalize_stage(merged, strategy, factors):
+    merged, _ = normalize_columns(merged, factors, stats=factor_stats(merged, strategy, factors))
+    return merged
 # %%
 
 # ------------------------------------------------
 # 10. Compute composite Aquaculture Suitability Index
 # ------------------------------------------------
-merged['SuitabilityIndex'] = (
-    0.25 * merged['EnvQuality_norm'] +
-    0.20 * merged['perm_norm'] +
-    0.20 * merged['total_sales_$1000_norm'] +
-    0.15 * merged['program_norm'] +
-    0.10 * merged['OpenCoast_norm'] +
-    0.10 * merged['port_norm']
-)
+def index_stage(merged, weights, nan_policy):
+    # See index_engine.py for batch scoring of many weight scenarios
+    merged = merged.copy()
+    merged['SuitabilityIndex'] = score_frame(merged, weights, nan_policy)
+    return merged
+# %%
+
+# ------------------------------------------------
+# 10b. Sub-state grid / hexagon cells (--grid)
+# ------------------------------------------------
+def grid_stage(merged, shape, cell_km, strategy):
+    # Same factors on a regular grid or hex tessellation of the coastal zone
+    czma, sanctuaries = coastal_layers(merged)
+    bbox = tuple(merged.to_crs("EPSG:4326").total_bounds)
+    nfhap = cached_layer(NFHAP_FILE, columns=['NFHAP_SCOR'], bbox=bbox, crs=EQUAL_AREA_CRS)
+    return grid_factors(merged.to_crs(EQUAL_AREA_CRS), czma, sanctuaries, nfhap, load_port_index(PORTS_FILE),
+                        shape=shape, cell_km=cell_km, strategy=strategy)
+# %%
+
+# ------------------------------------------------
+# Stage graph
+# ------------------------------------------------
+# code / modules: the helpers and constants each stage relies on beyond
+# its own body, so that editing them invalidates the cached output
+STAGES = [
+    Stage("states", load_states, inputs=[STATES_FILE], modules=["raw_layers", "regions"]),
+    Stage("regulatory", regulatory_stage, inputs=REGULATORY_FILES),
+    Stage("production", production_stage, inputs=[PRODUCTION_FILES[k] for k in PRODUCTION_COLUMNS],
+          code=[PRODUCTION_COLUMNS], modules=["regions"]),
+    Stage("programs", programs_stage, inputs=[PROGRAMS_FILE]),
+    Stage("nfhap", nfhap_stage, inputs=[NFHAP_FILE], code=[membership_means], modules=["raw_layers", "regions"]),
+    Stage("open_coast", open_coast_stage, inputs=[CZMA_FILE, SANCTUARY_FILE], deps=["states"],
+          code=[coastal_layers], modules=["overlay", "raw_layers"]),
+    Stage("ports", ports_stage, inputs=[PORTS_FILE], params={"k": PORT_NEIGHBOURS}, deps=["states"],
+          modules=["port_distance", "raw_layers", "regions"]),
+    Stage("merge", merge_stage,
+          deps=["states", "nfhap", "regulatory", "production", "programs", "open_coast", "ports"],
+          code=[MERGED_FACTORS, PRODUCTION_COLUMNS], modules=["regions"]),
+    Stage("normalize", normalize_stage, params={"strategy": "minmax", "factors": index_factors(INDEX_WEIGHTS)},
+          deps=["merge"], code=[factor_stats, INVERTED_FACTORS], modules=["normalization"]),
+    Stage("index", index_stage, params={"weights": INDEX_WEIGHTS, "nan_policy": "propagate"}, deps=["normalize"],
+          modules=["index_engine"]),
+]
+
+
+def normalization_stages(stages, strategy):
+    return [replace(stage, params={**stage.params, "strategy": strategy}) if stage.name == "normalize" else stage
+            for stage in stages]
+
+
+def nfhap_weight_stages(stages, weight):
+    if weight == "mean":
+        return stages
+    area = Stage("nfhap", nfhap_area_stage, inputs=[NFHAP_FILE],
+                 params={"chunk_rows": NFHAP_CHUNK_ROWS}, deps=["states"],
+                 modules=["overlay", "raw_layers", "regions"])
+    return [area if stage.name == "nfhap" else stage for stage in stages]
+
+
+def grid_stages(shape, cell_km, strategy="minmax"):
+    # Cells rarely have every factor, so missing ones are renormalized away
+    return [
+        Stage("grid", grid_stage, inputs=[CZMA_FILE, SANCTUARY_FILE, NFHAP_FILE, PORTS_FILE],
+              params={"shape": shape, "cell_km": cell_km, "strategy": strategy}, deps=["normalize"],
+              code=[coastal_layers],
+              modules=["grid", "normalization", "overlay", "port_distance", "raw_layers"]),
+        Stage("grid_index", index_stage, params={"weights": INDEX_WEIGHTS, "nan_policy": "renormalize"},
+              deps=["grid"], modules=["index_engine"]),
+    ]
 # %%
 
 # ------------------------------------------------
 # 11. Save outputs
 # ------------------------------------------------
-merged.to_file(out_dir / "aquaculture_suitability_full.gpkg", driver="GPKG")
-merged.drop(columns='geometry').to_csv(out_dir / "aquaculture_suitability_full.csv", index=False)
+def save_outputs(merged, strategy="minmax"):
+    # Fit statistics, so new data can be put on the same scale without refitting
+    save_stats(NORMALIZATION_FILE, factor_stats(merged, strategy, index_factors(INDEX_WEIGHTS)))
+    merged.to_file(out_dir / "aquaculture_suitability_full.gpkg", driver="GPKG")
+    merged.drop(columns='geometry').to_csv(out_dir / "aquaculture_suitability_full.csv", index=False)
+    # Columnar copy for the dashboards (see factor_store.py)
+    write_table("suitability", merged)
 # %%
 
 # ------------------------------------------------
 # 12. Quick visualization
 # ------------------------------------------------
-fig, ax = plt.subplots(figsize=(12, 8))
-merged.plot(
-    column='SuitabilityIndex',
-    cmap='YlGnBu',
-    legend=True,
-    edgecolor='gray',
-    linewidth=0.5,
-    ax=ax
-)
-ax.set_title("Composite Aquaculture Suitability Index by State", fontsize=14)
-ax.axis('off')
-plt.tight_layout()
-plt.show()
+def plot_index(merged):
+    # Imported here so headless runs never load matplotlib
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(12, 8))
+    merged.plot(
+        column='SuitabilityIndex',
+        cmap='YlGnBu',
+        legend=True,
+        edgecolor='gray',
+        linewidth=0.5,
+        ax=ax
+    )
+    ax.set_title("Composite Aquaculture Suitability Index by State", fontsize=14)
+    ax.axis('off')
+    plt.tight_layout()
+    plt.show()
 # %%
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="National aquaculture suitability pipeline")
+    parser.add_argument("--force", action="append", default=[], metavar="STAGE",
+                        help="recompute STAGE even if cached ('all' for every stage)")
+    parser.add_argument("--workers", type=int, default=1, metavar="N",
+                        help="run independent stages in a pool of N processes")
+    parser.add_argument("--grid", choices=SHAPES,
+                        help="also score square or hex cells covering the coastal zone")
+    parser.add_argument("--cell-km", type=float, default=10.0,
+                        help="grid cell size: side of an equal-area cell in km (default 10)")
+    parser.add_argument("--nfhap-weight", choices=NFHAP_WEIGHTS, default="mean",
+                        help="NFHAP score per state: mean over tagged polygons (default) or "
+                             "weighted by clipped area inside each state")
+    parser.add_argument("--normalize", choices=STRATEGIES, default="minmax",
+                        help="factor normalization strategy (default minmax; see normalization.py)")
+    parser.add_argument("--headless", action="store_true",
+                        help="skip the final plot (matplotlib is not imported)")
+    parser.add_argument("--profile", action="store_true",
+                        help="record time, memory and rows per stage (data_processed/profile/)")
+    parser.add_argument("--cprofile", action="store_true",
+                        help="with --profile, also dump a cProfile per stage")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="with --profile, also record peak Python allocations per stage")
+    args = parser.parse_args(argv)
+    profiler = StageProfiler(args.profile, cprofile=args.profile and args.cprofile,
+                             trace_memory=args.profile and args.tracemalloc)
+
+    stages = normalization_stages(nfhap_weight_stages(STAGES, args.nfhap_weight), args.normalize)
+    stages += grid_stages(args.grid, args.cell_km, args.normalize) if args.grid else []
+
+    out_dir.mkdir(exist_ok=True)
+    results = run_stages(stages, StageCache(stage_dir), force=set(args.force),
+                         workers=args.workers, profiler=profiler)
+    merged = results["index"]
+    with profiler.stage("save_outputs", status="written") as record:
+        save_outputs(merged, args.normalize)
+        if args.grid:
+            write_table(f"suitability_{args.grid}_grid", results["grid_index"])
+        record["rows"] = len(merged)
+    if profiler.enabled:
+        print(profiler.summary())
+        print(f"✅ Profile saved to {profiler.report()}")
+    if not args.headless:
+        plot_index(merged)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# ================================================================
+# grid.py
+# Sub-state grid / hexagon suitability cells for the coastal zone
+# ================================================================
+# Tessellates the CZMA extent into square or hexagonal cells of a given
+# area (in the equal-area CRS) and computes every spatial factor per
+# cell. Cells are generated and processed a block of grid rows at a
+# time; each block is a handful of vectorized STRtree queries, so the
+# number of cells (tens of thousands to millions) only affects run time,
+# not the size of any intermediate:
+#
+#   EnvQualityIndex  mean NFHAP_SCOR of NFHAP polygons touching the cell
+#   open_coast_frac  (cell ∩ CZMA - sanctuaries) / cell area
+#   port_dist_km     great-circle distance from the cell centre to the
+#                    nearest port (port_distance.PortIndex)
+#
+# Non-spatial factors (regulatory, production, programs) are inherited
+# from the state nearest to the cell centre.
+# ================================================================
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from pyproj import Transformer
+
+from normalization import normalize_columns
+from overlay import EQUAL_AREA_CRS, OverlayLayer, geometry_array, open_area_km2
+
+STATE_FACTORS = ["perm_norm", "total_sales_$1000_norm", "program_norm"]
+# Per-cell raw factor -> normalized column; ports inverted
+CELL_FACTORS = {
+    "EnvQualityIndex": "EnvQuality_norm",
+    "open_coast_frac": "OpenCoast_norm",
+    "port_dist_km": "port_norm",
+}
+SHAPES = ("square", "hex")
+
+
+# ------------------------------------------------
+# 1. Tessellation
+# ------------------------------------------------
+def iter_cell_blocks(bounds, shape="square", cell_km=10.0, block_rows=64):
+    # Yields (cell ids, centre xy, cell polygons) for successive blocks of rows
+    if shape not in SHAPES:
+        raise ValueError(f"shape must be one of {SHAPES}")
+    minx, miny, maxx, maxy = bounds
+    area = (cell_km * 1000.0) ** 2
+
+    if shape == "square":
+        side = np.sqrt(area)
+        dx, dy = side, side
+    else:
+        # Pointy-top hexagons with circumradius r and the requested area
+        r = np.sqrt(2 * area / (3 * np.sqrt(3)))
+        dx, dy = np.sqrt(3) * r, 1.5 * r
+        angles = np.deg2rad(np.arange(30, 390, 60))
+        ring = np.stack([r * np.cos(angles), r * np.sin(angles)], axis=1)
+
+    n_cols = int(np.ceil((maxx - minx) / dx)) + 1
+    n_rows = int(np.ceil((maxy - miny) / dy)) + 1
+
+    for row0 in range(0, n_rows, block_rows):
+        rows, cols = np.divmod(np.arange(row0 * n_cols, min(row0 + block_rows, n_rows) * n_cols), n_cols)
+        x = minx + cols * dx
+        y = miny + rows * dy
+        if shape == "square":
+            cells = shapely.box(x - dx / 2, y - dy / 2, x + dx / 2, y + dy / 2)
+        else:
+            x = x + (rows % 2) * dx / 2
+            cells = shapely.polygons(np.stack([x, y], axis=1)[:, None, :] + ring[None, :, :])
+        yield rows * n_cols + cols, np.stack([x, y], axis=1), cells
+
+
+# ------------------------------------------------
+# 2. Per-cell factors
+# ------------------------------------------------
+def grid_factors(merged, czma, sanctuaries, nfhap, port_index, shape="square", cell_km=10.0, block_rows=64,
+                 strategy="minmax"):
+    # All layers must already be in EQUAL_AREA_CRS; port_index is a PortIndex
+    czma_layer = OverlayLayer(geometry_array(czma))
+    sanctuary_layer = OverlayLayer(geometry_array(sanctuaries))
+    nfhap_tree = shapely.STRtree(geometry_array(nfhap))
+    nfhap_score = nfhap["NFHAP_SCOR"].to_numpy(dtype=float)
+    to_lonlat = Transformer.from_crs(EQUAL_AREA_CRS, "EPSG:4326", always_xy=True)
+    state_tree = shapely.STRtree(geometry_array(merged))
+    state_values = merged[["state"] + STATE_FACTORS].reset_index(drop=True)
+
+    blocks = []
+    for cell_id, centres, cells in iter_cell_blocks(shapely.total_bounds(czma_layer.geoms),
+                                                    shape, cell_km, block_rows):
+        # Keep only cells touching the coastal zone
+        keep = np.unique(czma_layer.tree.query(cells, predicate="intersects")[0])
+        if keep.size == 0:
+            continue
+        cell_id, centres, cells = cell_id[keep], centres[keep], cells[keep]
+        points = shapely.points(centres)
+        n = len(cells)
+
+        areas = open_area_km2(cells, czma_layer, sanctuary_layer)
+
+        cell_idx, poly_idx = nfhap_tree.query(cells, predicate="intersects")
+        hits = np.bincount(cell_idx, minlength=n)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            env = np.bincount(cell_idx, weights=nfhap_score[poly_idx], minlength=n) / hits
+
+        lon, lat = to_lonlat.transform(centres[:, 0], centres[:, 1])
+        port_dist = port_index.query(lon, lat, k=1)[0][:, 0]
+
+        (si, state_idx) = state_tree.query_nearest(points, all_matches=False)
+        block = state_values.iloc[state_idx].reset_index(drop=True)
+        block.index = si
+        block = block.reindex(np.arange(n))
+
+        block.insert(0, "cell_id", cell_id)
+        block["EnvQualityIndex"] = env
+        block["open_coast_frac"] = areas["open_km2"] * 1e6 / shapely.area(cells)
+        block["port_dist_km"] = port_dist
+        block["geometry"] = cells
+        blocks.append(block)
+
+    grid = pd.concat(blocks, ignore_index=True)
+
+    # Normalize over all cells
+    grid, _ = normalize_columns(grid, CELL_FACTORS, strategy, invert=["port_dist_km"])
+    return gpd.GeoDataFrame(grid, geometry="geometry", crs=EQUAL_AREA_CRS)
@@ -0,0 +1,305 @@
+# ================================================================
+# incremental.py
+# Re-score one state after NOAA revises its report section
+# ================================================================
+# Instead of re-parsing every report, re-scoring every CSV and re-running
+# the whole pipeline, only the revised state is carried through:
+#
+#   1. its section is parsed from the revised report text
+#   2. its raw law / fee / timeframe values are replaced in that report's
+#      *_parsed_scored.csv; fees_norm and time_norm are rescaled for that
+#      row only, unless the state moves a global min or max, in which case
+#      the column is renormalized for every state
+#   3. its regulatory_access_score, mean over the three reports (the
+#      per-report scores are its contributions), is patched into the
+#      output and perm_norm is transformed with the persisted fit
+#      statistics (normalization.json); the column is refitted, and
+#      perm_norm updated for every state, only if an extreme moved or the
+#      pipeline ran with a strategy other than minmax
+#   4. SuitabilityIndex is recomputed for the affected states and patched
+#      into aquaculture_suitability_full.csv, the GPKG (an attribute UPDATE
+#      through SQLite; geometries are left untouched), the factor store
+#      and the fit statistics
+#   5. the cells of the affected states in the factor store's grid tables
+#      (full_pipeline.py --grid), which inherit perm_norm from their
+#      state, get the new perm_norm and are re-scored
+#
+# The running min/max aggregates are rebuilt from the 50-row CSVs on each
+# call, so there is no second copy of the data to fall out of sync.
+# geopandas is never imported; a single-state update takes well under a
+# second. The next full_pipeline.py run sees the changed CSV hash and
+# recomputes the affected stages as usual.
+#
+# Usage:
+#   python incremental.py <algae|finfish|shellfish> revised_report.txt "State Name"
+# ================================================================
+
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from factor_store import ROW_GROUP_SIZE, table_path
+from index_engine import INDEX_WEIGHTS, score_frame
+from normalization import column_stats, fit, load_stats, save_stats, set_column_stats, transform
+from parse_state_texts import FEE_COL, LAW_COL, TIME_COL, iter_records
+from regulatory_scoring import compute_score, normalize, parse_fees, parse_laws, parse_timeframe
+
+data_dir = Path("../data_raw")
+out_dir = Path("../data_processed")
+
+# Same files as full_pipeline.REGULATORY_FILES, keyed by report type
+SCORED_FILES = {
+    "finfish": data_dir / "Report-State-by-State-Summary-of-Finfish-Aquaculture-Leasing-Permitting-Requirements-2021_parsed_scored.csv",
+    "shellfish": data_dir / "Report-State-by-State-Summary-of-Shellfish-Aquaculture-Leasing-Permitting-Requirements-2021_parsed_scored.csv",
+    "algae": data_dir / "Report-State-by-State-Summary-of-Seaweed-Aquaculture-Leasing-Permitting-Requirements-2021_parsed_scored.csv",
+}
+OUTPUT_CSV = out_dir / "aquaculture_suitability_full.csv"
+OUTPUT_GPKG = out_dir / "aquaculture_suitability_full.gpkg"
+# full_pipeline.NORMALIZATION_FILE
+NORMALIZATION_FILE = out_dir / "normalization.json"
+PERM_RAW = "regulatory_access_score"
+# Factor store tables written by full_pipeline.py --grid (grid.SHAPES), and
+# the NaN policy their cells are scored with (full_pipeline.grid_stages)
+GRID_TABLES = ["suitability_square_grid", "suitability_hex_grid"]
+GRID_NAN_POLICY = "renormalize"
+
+
+class MinMax:
+    # Running min / max over keyed values (NaN ignored). Keeps how many keys
+    # sit at each extreme, so an update only rescans when the last key
+    # holding an extreme moves away from it.
+    def __init__(self, values):
+        self.values = {k: float(v) for k, v in values.items() if not pd.isna(v)}
+        self._rescan()
+
+    def _rescan(self):
+        vals = np.array(list(self.values.values()))
+        self.min = vals.min() if vals.size else np.nan
+        self.max = vals.max() if vals.size else np.nan
+        self.n_min = int((vals == self.min).sum())
+        self.n_max = int((vals == self.max).sum())
+
+    def update(self, key, value):
+        # Returns True if the global min or max changed
+        before = (self.min, self.max)
+        old = self.values.pop(key, np.nan)
+        if not pd.isna(value):
+            self.values[key] = float(value)
+        if pd.isna(old) and pd.isna(value):
+            return False
+        if not self.values or pd.isna(self.min):
+            self._rescan()
+        elif old == self.min and self.n_min == 1 or old == self.max and self.n_max == 1:
+            self._rescan()
+        else:
+            self.n_min -= old == self.min
+            self.n_max -= old == self.max
+            if not pd.isna(value):
+                if value < self.min:
+                    self.min, self.n_min = value, 0
+                if value > self.max:
+                    self.max, self.n_max = value, 0
+                self.n_min += value == self.min
+                self.n_max += value == self.max
+        return (self.min, self.max) != before
+
+    def scale(self, value, constant=1.0):
+        if pd.isna(value):
+            return np.nan
+        if self.max == self.min:
+            return constant
+        return (value - self.min) / (self.max - self.min)
+
+
+# ------------------------------------------------
+# 1. Parse the revised section
+# ------------------------------------------------
+def parse_state(text_file, report_type, state):
+    # Same rule as parse_file: the last section for the state wins
+    record = {"state": state, LAW_COL: "N/A", FEE_COL: "N/A", TIME_COL: "N/A"}
+    for found in iter_records(text_file, report_type):
+        if found["state"] == state:
+            record = found
+    return record
+
+
+# ------------------------------------------------
+# 2. Patch one report's scored CSV
+# ------------------------------------------------
+def rescore_report(scored, record):
+    # Returns (patched frame, states whose regulatory_access_score changed)
+    state = record["state"]
+    scored = scored.copy()
+    if state not in set(scored["state"]):
+        scored.loc[len(scored), "state"] = state
+    row = scored.index[scored["state"] == state][-1]
+    # Aggregates over the values as they were before the revision
+    aggs = {col: MinMax(scored[f"{col}_numeric"]) for col in ("fees", "time")}
+
+    raw = pd.Series([record[LAW_COL], record[FEE_COL], record[TIME_COL]], dtype=object)
+    for col, value in zip((LAW_COL, FEE_COL, TIME_COL), raw):
+        # Fees are a number or a "No" / "N/A" marker
+        scored[col] = scored[col].astype(object)
+        scored.loc[row, col] = value
+    scored.loc[row, "laws_numeric"] = parse_laws(raw.iloc[[0]]).iloc[0]
+    scored.loc[row, "fees_numeric"] = parse_fees(raw.iloc[[1]]).iloc[0]
+    scored.loc[row, "time_numeric"] = parse_timeframe(raw.iloc[[2]]).iloc[0]
+    scored.loc[row, "laws_norm"] = scored.loc[row, "laws_numeric"]
+
+    changed = [row]
+    for col, agg in aggs.items():
+        value = scored.loc[row, f"{col}_numeric"]
+        if agg.update(row, value):
+            scored[f"{col}_norm"] = normalize(scored[f"{col}_numeric"])
+            changed = list(scored.index)
+        else:
+            scored.loc[row, f"{col}_norm"] = agg.scale(value)
+
+    scored["regulatory_access_score"] = scored["regulatory_access_score"].astype(object)
+    scored.loc[changed, "regulatory_access_score"] = compute_score(scored.loc[changed])
+    return scored, scored.loc[changed, "state"].tolist()
+
+
+# ------------------------------------------------
+# 3. Regulatory mean and perm_norm
+# ------------------------------------------------
+def regulatory_means(frames):
+    scores = pd.concat([f[["state", "regulatory_access_score"]] for f in frames])
+    scores["regulatory_access_score"] = pd.to_numeric(scores["regulatory_access_score"], errors="coerce")
+    return scores.groupby("state")["regulatory_access_score"].mean()
+
+
+def update_perm_norm(output, new_means, states, stats):
+    # Patches the regulatory mean and perm_norm of ``states`` (those in the
+    # output); returns every state whose perm_norm changed. stats is updated
+    # in place when the column is refitted.
+    output = output.copy()
+    states = [s for s in states if s in set(output["state"])]
+    agg = MinMax(output.set_index("state")[PERM_RAW])
+    moved = False
+    for state in states:
+        moved |= agg.update(state, new_means.get(state, np.nan))
+    patched = output["state"].isin(states)
+    output.loc[patched, PERM_RAW] = output.loc[patched, "state"].map(new_means)
+
+    single = column_stats(stats, PERM_RAW)
+    if moved or stats["strategy"] != "minmax":
+        invert = [PERM_RAW] if single["invert"][0] else ()
+        single = fit(output[PERM_RAW], stats["strategy"], [PERM_RAW], invert, stats["constant"])
+        set_column_stats(stats, single)
+        patched = np.ones(len(output), dtype=bool)
+    else:
+        patched = patched.to_numpy()
+    output.loc[patched, "perm_norm"] = transform(output.loc[patched, PERM_RAW], single)[:, 0]
+    return output, output.loc[patched, "state"].tolist()
+
+
+# ------------------------------------------------
+# 4. Patch outputs in place
+# ------------------------------------------------
+def _gpkg_is_empty(blob):
+    # GeoPackage binary header: flags byte bit 4 marks an empty geometry
+    return None if blob is None else int(bool(blob[3] & 0x10))
+
+
+def _no_geometry_change(blob):
+    raise sqlite3.DatabaseError("geometry changes are not supported")
+
+
+def patch_gpkg(path, frame, columns):
+    # UPDATE only the attribute columns of the changed rows; geometry untouched.
+    # GDAL's R-tree triggers reference SpatiaLite-style functions, which must
+    # exist for the UPDATE to compile; they only run when a geometry changes.
+    with sqlite3.connect(str(path)) as con:
+        con.create_function("ST_IsEmpty", 1, _gpkg_is_empty)
+        for name in ("ST_MinX", "ST_MaxX", "ST_MinY", "ST_MaxY"):
+            con.create_function(name, 1, _no_geometry_change)
+        table = con.execute("SELECT table_name FROM gpkg_contents WHERE data_type = 'features'").fetchone()[0]
+        assignments = ", ".join(f'"{c}" = ?' for c in columns)
+        rows = [[None if pd.isna(v) else float(v) for v in r[columns]] + [r["state"]] for _, r in frame.iterrows()]
+        con.executemany(f'UPDATE "{table}" SET {assignments} WHERE "state" = ?', rows)
+
+
+def _patch_table(name, patch):
+    # patch(df) edits the table's rows in place and returns whether any changed
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = table_path(name)
+    if not path.exists():
+        return
+    table = pq.read_table(path)
+    df = table.to_pandas()
+    if not patch(df):
+        return
+    patched = pa.Table.from_pandas(df, schema=table.schema, preserve_index=False)
+    pq.write_table(patched.replace_schema_metadata(table.schema.metadata), path, row_group_size=ROW_GROUP_SIZE)
+
+
+def patch_factor_store(frame, columns, name="suitability"):
+    lookup = frame.set_index("state")
+
+    def patch(df):
+        rows = df["state"].isin(lookup.index)
+        for c in columns:
+            df.loc[rows, c] = df.loc[rows, "state"].map(lookup[c])
+        return rows.any()
+
+    _patch_table(name, patch)
+
+
+def patch_grid_tables(frame):
+    # Cells carry their state's perm_norm (grid.STATE_FACTORS); only the
+    # cells of the states in frame are re-scored
+    perm_norm = frame.set_index("state")["perm_norm"]
+
+    def patch(df):
+        rows = df["state"].isin(perm_norm.index)
+        if not rows.any():
+            return False
+        df.loc[rows, "perm_norm"] = df.loc[rows, "state"].map(perm_norm)
+        df.loc[rows, "SuitabilityIndex"] = score_frame(df.loc[rows], INDEX_WEIGHTS, GRID_NAN_POLICY)
+        return True
+
+    for name in GRID_TABLES:
+        _patch_table(name, patch)
+
+
+def update_state(report_type, text_file, state):
+    record = parse_state(text_file, report_type, state)
+
+    frames = {t: pd.read_csv(p) for t, p in SCORED_FILES.items()}
+    frames[report_type], rescored = rescore_report(frames[report_type], record)
+
+    output = pd.read_csv(OUTPUT_CSV)
+    if NORMALIZATION_FILE.exists():
+        stats = load_stats(NORMALIZATION_FILE)
+    else:
+        stats = fit(output[[PERM_RAW]], "minmax", [PERM_RAW])
+    output, affected = update_perm_norm(output, regulatory_means(frames.values()), rescored, stats)
+
+    rows = output["state"].isin(affected)
+    output.loc[rows, "SuitabilityIndex"] = score_frame(output.loc[rows], INDEX_WEIGHTS, "propagate")
+
+    # GPKG first: its UPDATE is a transaction, so a failure leaves every file as it was
+    columns = [PERM_RAW, "perm_norm", "SuitabilityIndex"]
+    if OUTPUT_GPKG.exists():
+        patch_gpkg(OUTPUT_GPKG, output.loc[rows], columns)
+    patch_factor_store(output.loc[rows], columns)
+    patch_grid_tables(output.loc[rows])
+    output.to_csv(OUTPUT_CSV, index=False)
+    save_stats(NORMALIZATION_FILE, stats)
+    frames[report_type].to_csv(SCORED_FILES[report_type], index=False)
+    return record, output.loc[rows]
+
+
+if __name__ == "__main__":
+    REPORT_TYPE, TEXT_FILE, STATE = sys.argv[1].lower(), sys.argv[2], sys.argv[3]
+    start = time.perf_counter()
+    record, patched = update_state(REPORT_TYPE, TEXT_FILE, STATE)
+    print(f"  {STATE}: laws={record[LAW_COL]!r} fees={record[FEE_COL]!r} time={record[TIME_COL]!r}")
+    print(f"✅ Re-scored {len(patched)} state(s) in {time.perf_counter() - start:.2f} s")
@@ -0,0 +1,112 @@
+# ================================================================
+# index_engine.py
+# Vectorized weighted-index scoring for batches of weight scenarios
+# ================================================================
+# The merged state-by-factor table is turned into one NumPy matrix X
+# (regions x factors) and any number of weight vectors are stacked into
+# W (scenarios x factors). All scenario indices are then a single
+# matrix product W @ X.T, with an explicit policy for missing factors:
+#
+#   propagate   - NaN if any weighted factor is missing (section 10 of
+#                 full_pipeline.py, i.e. plain pandas arithmetic)
+#   renormalize - drop missing factors and rescale the remaining weights
+#                 to the scenario's total weight (regulatory_scoring's
+#                 compute_score behaviour)
+#   zero        - treat missing factors as 0
+#
+# Usage:
+#   python index_engine.py weights.csv [suitability.csv] [policy]
+# weights.csv has one column per factor and one row per scenario.
+# ================================================================
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+NAN_POLICIES = ("propagate", "renormalize", "zero")
+
+# Section-10 weights of the composite Aquaculture Suitability Index
+INDEX_WEIGHTS = {
+    "EnvQuality_norm": 0.25,
+    "perm_norm": 0.20,
+    "total_sales_$1000_norm": 0.20,
+    "program_norm": 0.15,
+    "OpenCoast_norm": 0.10,
+    "port_norm": 0.10
+}
+
+
+def factor_matrix(frame, columns):
+    return frame[list(columns)].to_numpy(dtype=float)
+
+
+def weight_matrix(weights, columns=None):
+    # Accepts a {factor: weight} dict, a DataFrame with factor columns,
+    # or a 1D/2D array already ordered like ``columns``
+    if isinstance(weights, dict):
+        weights = [weights[c] for c in columns]
+    elif isinstance(weights, pd.DataFrame):
+        weights = weights[list(columns)].to_numpy(dtype=float)
+    return np.atleast_2d(np.asarray(weights, dtype=float))
+
+
+def score_scenarios(X, W, nan_policy="renormalize"):
+    # Returns a (scenarios x regions) array of index values
+    if nan_policy not in NAN_POLICIES:
+        raise ValueError(f"nan_policy must be one of {NAN_POLICIES}")
+    X = np.asarray(X, dtype=float)
+    W = np.atleast_2d(np.asarray(W, dtype=float))
+    if W.shape[1] != X.shape[1]:
+        raise ValueError(f"weights have {W.shape[1]} factors, matrix has {X.shape[1]}")
+
+    present = ~np.isnan(X)
+    scores = W @ np.where(present, X, 0.0).T
+
+    if nan_policy == "zero":
+        return scores
+    if nan_policy == "propagate":
+        missing = (W != 0).astype(float) @ (~present).astype(float).T
+        scores[missing > 0] = np.nan
+        return scores
+
+    present_weight = W @ present.T.astype(float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = scores * (W.sum(axis=1, keepdims=True) / present_weight)
+    scores[present_weight == 0] = np.nan
+    return scores
+
+
+def rank_scores(scores):
+    # Rank regions within each scenario, 1 = highest score, NaN scores unranked
+    scores = np.atleast_2d(scores)
+    order = np.argsort(np.where(np.isnan(scores), np.inf, -scores), axis=1, kind="stable")
+    ranks = np.empty(scores.shape, dtype=float)
+    np.put_along_axis(ranks, order, np.arange(1, scores.shape[1] + 1, dtype=float)[None, :], axis=1)
+    ranks[np.isnan(scores)] = np.nan
+    return ranks
+
+
+def score_frame(frame, weights, nan_policy="propagate"):
+    # Single-scenario convenience wrapper used by full_pipeline.py
+    columns = list(weights)
+    X = factor_matrix(frame, columns)
+    return pd.Series(score_scenarios(X, weight_matrix(weights, columns), nan_policy)[0],
+                     index=frame.index)
+
+
+if __name__ == "__main__":
+    WEIGHTS_CSV = sys.argv[1]
+    SUITABILITY_CSV = sys.argv[2] if len(sys.argv) > 2 else "../data_processed/aquaculture_suitability_full.csv"
+    NAN_POLICY = sys.argv[3] if len(sys.argv) > 3 else "renormalize"
+    OUTPUT_CSV = WEIGHTS_CSV.rsplit(".csv", 1)[0] + "_ranks.csv"
+
+    scenarios = pd.read_csv(WEIGHTS_CSV)
+    merged = pd.read_csv(SUITABILITY_CSV)
+    columns = list(scenarios.columns)
+
+    scores = score_scenarios(factor_matrix(merged, columns), weight_matrix(scenarios, columns), NAN_POLICY)
+    ranks = pd.DataFrame(rank_scores(scores), columns=merged["state"], index=scenarios.index)
+    ranks.index.name = "scenario"
+    ranks.to_csv(OUTPUT_CSV)
+    print(f"✅ Ranked {len(merged)} states under {len(scenarios)} weight scenarios. Saved to {OUTPUT_CSV}")
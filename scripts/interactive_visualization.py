@@ -1,21 +1,29 @@
 # %%
 
-import geopandas as gpd
 import folium
 from folium.features import GeoJsonTooltip, GeoJsonPopup
 from pathlib import Path
 
+from factor_store import load_layer, read_table
+from map_layers import add_ports, add_states, near_states
+
 # Directories
 data_dir = Path("../data_raw")
 out_dir = Path("../data_processed")
 
-# Load processed suitability data
-merged = gpd.read_file(out_dir / "aquaculture_suitability_full.gpkg")
+# Columns shown in the state tooltip
+tooltip_fields = ["state", "SuitabilityIndex",
+                  "EnvQuality_norm", "perm_norm",
+                  "total_sales_$1000_norm", "program_norm",
+                  "OpenCoast_norm", "port_norm"]
+
+# Load processed suitability data (factor store, already in lon/lat)
+merged = read_table("suitability", columns=tooltip_fields)
 
-# Load infrastructure / CZMA / sanctuary layers
-ports = gpd.read_file(data_dir / "ne_10m_ports.shp").to_crs(merged.crs)
-czma = gpd.read_file(data_dir / "CoastalZoneManagementAct.gpkg").to_crs(merged.crs)
-sanctuaries = gpd.read_file(data_dir / "NationalMarineSanctuary.gpkg").to_crs(merged.crs)
+# Load infrastructure / CZMA / sanctuary layers; ports only around the states
+ports = near_states(load_layer("ports", columns=["name"]), merged)
+czma = load_layer("czma", columns=["CZMADomain"])
+sanctuaries = load_layer("sanctuaries", columns=["siteName"])
 # %%
 
 # Create base map
@@ -24,54 +32,23 @@ m = folium.Map(location=[39.5, -98.35], zoom_start=4, tiles="cartodbpositron")
 # -----------------------------
 # 1. Choropleth layer: Suitability Index
 # -----------------------------
-folium.Choropleth(
-    geo_data=merged,
-    name="Suitability Index",
-    data=merged,
-    columns=["state", "SuitabilityIndex"],
-    key_on="feature.properties.state",
-    fill_color="YlGnBu",
-    fill_opacity=0.7,
-    line_opacity=0.5,
-    legend_name="Aquaculture Suitability Index"
-).add_to(m)
-
-# Hover tooltip for states
-tooltip_fields = ["state", "SuitabilityIndex",
-                  "EnvQuality_norm", "perm_norm",
-                  "total_sales_$1000_norm", "program_norm",
-                  "OpenCoast_norm", "port_norm"]
-
-tooltip = GeoJsonTooltip(
-    fields=tooltip_fields,
+# Geometry is embedded once (TopoJSON); fill and tooltip read one score table
+add_states(
+    m, merged, tooltip_fields,
     aliases=["State:", "Suitability Index:",
              "Environmental Quality:", "Regulatory Score:",
              "Product Value:", "Program Density:",
              "Open Coast Area:", "Port Accessibility:"],
-    localize=True,
-    sticky=True,
-    labels=True,
-    style=("background-color: white; color: #333; font-family: Arial; font-size: 12px; padding: 5px;")
+    fill_color="YlGnBu",
+    fill_opacity=0.7,
+    legend_name="Aquaculture Suitability Index"
 )
 
-folium.GeoJson(
-    merged,
-    style_function=lambda x: {"fillColor": "#transparent", "color": "black", "weight": 0.5},
-    tooltip=tooltip
-).add_to(m)
-
 # -----------------------------
 # 2. Ports as clickable markers
 # -----------------------------
-for _, row in ports.iterrows():
-    folium.CircleMarker(
-        location=[row.geometry.y, row.geometry.x],
-        radius=4,
-        color="red",
-        fill=True,
-        fill_opacity=0.7,
-        popup=folium.Popup(f"Port: {row.get('name', 'Unknown')}", parse_html=True)
-    ).add_to(m)
+# One packed array, clipped to the mapped states; markers and popups are built in the browser
+add_ports(m, ports, radius=4, fill_opacity=0.7)
 
 # -----------------------------
 # 3. CZMA boundaries (transparent overlay)
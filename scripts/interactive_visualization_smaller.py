@@ -1,106 +1,90 @@
 # %%
-import geopandas as gpd
 import folium
 from folium.features import GeoJsonTooltip
 from pathlib import Path
 
+from factor_store import RAW_LAYERS, load_layer, read_table, table_path
+from map_layers import add_ports, add_states, add_zoom_levels, near_states
+from pyramid import load_pyramid
+
 # Directories
 data_dir = Path("../data_raw")
 out_dir = Path("../data_processed")
 
-# Load processed suitability data
-merged = gpd.read_file(out_dir / "aquaculture_suitability_full.gpkg")
+# Start zoom, and the pyramid levels embedded in the page; the map shows
+# the coarsest level detailed enough for its zoom (the last one past it)
+ZOOM = 4
+LEVELS = (4, 6)
+# TopoJSON grid steps of ~400 m at z4, halved per zoom level
+QUANTIZATION = {z: 10000 * 2 ** (z - ZOOM) for z in LEVELS}
 
-# Load infrastructure / CZMA / sanctuary layers
-ports = gpd.read_file(data_dir / "ne_10m_ports.shp").to_crs(merged.crs)
-czma = gpd.read_file(data_dir / "CoastalZoneManagementAct.gpkg").to_crs(merged.crs)
-sanctuaries = gpd.read_file(data_dir / "NationalMarineSanctuary.gpkg").to_crs(merged.crs)
+tooltip_fields = ["state", "SuitabilityIndex",
+                  "EnvQuality_norm", "perm_norm",
+                  "total_sales_$1000_norm", "program_norm",
+                  "OpenCoast_norm", "port_norm"]
 
 # ==============================
-# 🔹 STEP 1: Simplify geometries
+# 🔹 STEP 1: Load simplified geometries
 # ==============================
-# This drastically reduces HTML size
-merged["geometry"] = merged.geometry.simplify(tolerance=0.05, preserve_topology=True)
-czma["geometry"] = czma.geometry.simplify(tolerance=0.05, preserve_topology=True)
-sanctuaries["geometry"] = sanctuaries.geometry.simplify(tolerance=0.05, preserve_topology=True)
+# Cached zoom pyramid (see pyramid.py); shared state borders are
+# simplified once, so neighbours meet without slivers
+# Full-resolution layers come from the factor store (see factor_store.py)
+states = load_pyramid("states", [table_path("suitability")],
+                      lambda: read_table("suitability", columns=tooltip_fields), zooms=LEVELS)
+czma = load_pyramid("czma", [RAW_LAYERS["czma"]], lambda: load_layer("czma", columns=["CZMADomain"]), zooms=LEVELS)
+sanctuaries = load_pyramid("sanctuaries", [RAW_LAYERS["sanctuaries"]],
+                           lambda: load_layer("sanctuaries", columns=["siteName"]), zooms=LEVELS)
+# Scores, and the polygons ports are clipped to, come from the coarsest level
+merged = states[LEVELS[0]]
+
+# Ports are points and need no simplification; only those near the states are kept
+ports = near_states(load_layer("ports", columns=["name"]), merged)
 
 # ==============================
 # 🔹 STEP 2: Create base map
 # ==============================
-m = folium.Map(location=[39.5, -98.35], zoom_start=4, tiles="CartoDB positron")
+m = folium.Map(location=[39.5, -98.35], zoom_start=ZOOM, tiles="CartoDB positron")
 
 # -----------------------------
 # 1. Choropleth layer: Suitability Index
 # -----------------------------
-folium.Choropleth(
-    geo_data=merged,
-    name="Suitability Index",
-    data=merged,
-    columns=["state", "SuitabilityIndex"],
-    key_on="feature.properties.state",
-    fill_color="YlGnBu",
-    fill_opacity=0.7,
-    line_opacity=0.5,
-    legend_name="Aquaculture Suitability Index"
-).add_to(m)
-
-# Hover tooltip for states (keep the same)
-tooltip_fields = ["state", "SuitabilityIndex",
-                  "EnvQuality_norm", "perm_norm",
-                  "total_sales_$1000_norm", "program_norm",
-                  "OpenCoast_norm", "port_norm"]
-
-tooltip = GeoJsonTooltip(
-    fields=tooltip_fields,
+# Geometry is embedded once (TopoJSON); fill and tooltip read one score table
+add_states(
+    m, merged, tooltip_fields,
     aliases=["State:", "Suitability Index:",
              "Environmental Quality:", "Regulatory Score:",
              "Product Value:", "Program Density:",
              "Open Coast Area:", "Port Accessibility:"],
-    localize=True,
-    sticky=True,
-    labels=True,
-    style=("background-color: white; color: #333; font-family: Arial; "
-           "font-size: 12px; padding: 5px;")
+    fill_color="YlGnBu",
+    fill_opacity=0.7,
+    legend_name="Aquaculture Suitability Index",
+    levels=states,
+    quantization=QUANTIZATION
 )
 
-folium.GeoJson(
-    merged,
-    style_function=lambda x: {"fillColor": "#transparent", "color": "black", "weight": 0.5},
-    tooltip=tooltip
-).add_to(m)
-
 # -----------------------------
 # 2. Ports as clickable markers
 # -----------------------------
-for _, row in ports.iterrows():
-    folium.CircleMarker(
-        location=[row.geometry.y, row.geometry.x],
-        radius=3,
-        color="red",
-        fill=True,
-        fill_opacity=0.6,
-        popup=f"Port: {row.get('name', 'Unknown')}"
-    ).add_to(m)
+# One packed array, clipped to the mapped states; markers and popups are built in the browser
+add_ports(m, ports, radius=3, fill_opacity=0.6)
 
 # -----------------------------
 # 3. CZMA boundaries
 # -----------------------------
-folium.GeoJson(
-    czma,
-    name="CZMA Boundaries",
+add_zoom_levels(m, czma, lambda level: folium.GeoJson(
+    level,
     style_function=lambda x: {"fillColor": "#1f77b4", "color": "#1f77b4", "weight": 0.7, "fillOpacity": 0.05},
     tooltip=GeoJsonTooltip(fields=["CZMADomain"], aliases=["CZMA Domain:"])
-).add_to(m)
+), name="CZMA Boundaries")
 
 # -----------------------------
 # 4. Marine Sanctuaries overlay
 # -----------------------------
-folium.GeoJson(
-    sanctuaries,
-    name="Marine Sanctuaries",
+add_zoom_levels(m, sanctuaries, lambda level: folium.GeoJson(
+    level,
     style_function=lambda x: {"fillColor": "#ff7f0e", "color": "#ff7f0e", "weight": 0.7, "fillOpacity": 0.1},
     tooltip=GeoJsonTooltip(fields=["siteName"], aliases=["Sanctuary:"])
-).add_to(m)
+), name="Marine Sanctuaries")
 
 # -----------------------------
 # Layer control
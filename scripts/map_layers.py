@@ -0,0 +1,239 @@
+# ================================================================
+# map_layers.py
+# Shared folium layers for the interactive dashboards
+# ================================================================
+# Ports are emitted as a single FastMarkerCluster: one packed
+# [lat, lon, name] array in the page, with markers and popups created
+# in the browser by a shared JS callback, instead of one CircleMarker
+# (and one popup object) per port built in Python. Only ports within
+# ROI_MARGIN_DEG of a mapped state's polygons are written (near_states),
+# and nearby ports are clustered when zoomed out.
+#
+# States are one layer (add_states): the geometry is embedded once as
+# quantized, delta-encoded TopoJSON (topology.py) and carries only a
+# feature id. Fill colour and tooltip both read a compact score table
+# (field names once, then one row of values per state), so a new weight
+# scenario only needs a new table: in Python pass the cached topology
+# back in, in the page call <layer>.setScores(table).
+#
+# Both add_states(levels=...) and add_zoom_levels embed several levels
+# of a geometry pyramid (pyramid.py) and show, after every zoom, the
+# level pyramid_level would pick for the map's zoom; state scores and
+# tooltips carry over, since every level has the same feature ids.
+# ================================================================
+
+import folium
+import numpy as np
+import shapely
+from branca.colormap import StepColormap
+from branca.element import MacroElement
+from branca.utilities import color_brewer
+from folium.elements import JSCSSMixin
+from folium.map import Layer
+from folium.plugins import FastMarkerCluster
+from jinja2 import Template
+
+from overlay import geometry_array
+from topology import QUANTIZATION, to_topology
+
+# Degrees of margin around the state polygons when clipping ports
+ROI_MARGIN_DEG = 2.0
+# ~10 m at the equator; plenty for a marker
+COORD_DECIMALS = 4
+# Digits kept in the state score table
+SCORE_DECIMALS = 4
+TOOLTIP_STYLE = "background-color: white; color: #333; font-family: Arial; font-size: 12px; padding: 5px;"
+
+PORT_CALLBACK = """
+function (row) {{
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {{
+        radius: {radius}, color: "red", fillColor: "red", fill: true, fillOpacity: {fill_opacity}
+    }});
+    marker.bindPopup(function () {{ return "Port: " + (row[2] || "Unknown"); }});
+    return marker;
+}}
+"""
+
+
+def near_states(points, states, margin=ROI_MARGIN_DEG):
+    # Points within margin degrees of any state polygon. The states reach
+    # across the antimeridian (Guam, American Samoa, the Aleutians), so one
+    # box around them would cover nearly the whole globe; each polygon part
+    # gets its own tight envelope in the tree instead
+    points = points.to_crs("EPSG:4326")
+    parts = shapely.get_parts(geometry_array(states.to_crs("EPSG:4326")))
+    hit = shapely.STRtree(parts).query(geometry_array(points), predicate="dwithin", distance=margin)[0]
+    return points.iloc[np.unique(hit)]
+
+
+def port_rows(ports, bounds=None):
+    # Packed [lat, lon, name] rows, optionally clipped to (minx, miny, maxx, maxy)
+    ports = ports.to_crs("EPSG:4326")
+    if bounds is not None:
+        ports = ports.cx[bounds[0]:bounds[2], bounds[1]:bounds[3]]
+    lat = np.round(ports.geometry.y.to_numpy(), COORD_DECIMALS)
+    lon = np.round(ports.geometry.x.to_numpy(), COORD_DECIMALS)
+    names = ports["name"].fillna("") if "name" in ports.columns else [""] * len(ports)
+    return [[float(y), float(x), str(n)] for y, x, n in zip(lat, lon, names)]
+
+
+def add_ports(m, ports, bounds=None, radius=3, fill_opacity=0.6, name="Ports"):
+    callback = PORT_CALLBACK.format(radius=radius, fill_opacity=fill_opacity)
+    FastMarkerCluster(
+        port_rows(ports, bounds),
+        callback=callback,
+        name=name,
+        options={"disableClusteringAtZoom": 7, "spiderfyOnMaxZoom": False},
+    ).add_to(m)
+
+
+# Index of the coarsest level whose zoom is at least the map zoom (the
+# finest level past the top); levels are [[zoom, ...], ...], coarsest first
+PICK_LEVEL_JS = """
+function (levels, zoom) {
+    for (var i = 0; i < levels.length; i++) { if (levels[i][0] >= zoom) { return i; } }
+    return levels.length - 1;
+}
+"""
+
+
+class StateLayer(JSCSSMixin, Layer):
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.geoJson().addTo({{ this._parent.get_name() }});
+
+            (function (layer, levels, style, map, pick) {
+                var table, value, current = null, features = {};
+                function fill(v) {
+                    if (v === null || v === undefined) { return style.nan_color; }
+                    var i = 0;
+                    while (i < style.colors.length - 1 && v >= style.bins[i + 1]) { i++; }
+                    return style.colors[i];
+                }
+                function show() {
+                    var i = pick(levels, map.getZoom());
+                    if (i === current) { return; }
+                    current = i;
+                    if (!features[i]) {
+                        features[i] = topojson.feature(levels[i][1], levels[i][1].objects.{{ this.object_name }});
+                    }
+                    layer.clearLayers();
+                    layer.addData(features[i]);
+                    if (table) { layer.setScores(table); }
+                }
+                layer.setScores = function (scores) {
+                    table = scores;
+                    value = scores.fields.indexOf(style.field);
+                    layer.setStyle(function (feature) {
+                        return {fillColor: fill(table.rows[feature.id][value]), fillOpacity: style.fill_opacity,
+                                color: "black", weight: style.line_weight, opacity: style.line_opacity};
+                    });
+                };
+                layer.bindTooltip(function (sub) {
+                    var row = table.rows[sub.feature.id], html = "<table>";
+                    for (var i = 0; i < style.aliases.length; i++) {
+                        var v = row[i] === null ? "" : row[i].toLocaleString();
+                        html += "<tr><th style='text-align:left'>" + style.aliases[i] + "</th><td>" + v + "</td></tr>";
+                    }
+                    return "<div style='" + style.tooltip_style + "'>" + html + "</table></div>";
+                }, {sticky: true});
+                show();
+                layer.setScores({{ this.scores|tojson }});
+                map.on("zoomend", show);
+            })({{ this.get_name() }}, {{ this.levels|tojson }}, {{ this.style|tojson }},
+               {{ this._parent.get_name() }}, {{ this.pick_level }});
+        {% endmacro %}
+        """)
+
+    default_js = [("topojson", "https://cdnjs.cloudflare.com/ajax/libs/topojson/1.6.9/topojson.min.js")]
+
+    def __init__(self, levels, scores, style, object_name="states", name=None):
+        # levels: [[zoom, topology], ...], coarsest first
+        super().__init__(name=name, overlay=True, control=True, show=True)
+        self._name = "StateLayer"
+        self.levels = levels
+        self.scores = scores
+        self.style = style
+        self.object_name = object_name
+        self.pick_level = PICK_LEVEL_JS
+
+
+class ZoomLevels(MacroElement):
+    # Keeps only the level layer picked for the map zoom in the group
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            (function (group, levels, map, pick) {
+                function show() {
+                    var current = pick(levels, map.getZoom());
+                    levels.forEach(function (level, i) {
+                        if (i === current) { group.addLayer(level[1]); } else { group.removeLayer(level[1]); }
+                    });
+                }
+                show();
+                map.on("zoomend", show);
+            })({{ this.group.get_name() }},
+               [{% for zoom, layer in this.levels %}[{{ zoom }}, {{ layer.get_name() }}]{{ "," if not loop.last }}{% endfor %}],
+               {{ this._parent.get_name() }}, {{ this.pick_level }});
+        {% endmacro %}
+        """)
+
+    def __init__(self, group, levels):
+        super().__init__()
+        self._name = "ZoomLevels"
+        self.group = group
+        self.levels = levels
+        self.pick_level = PICK_LEVEL_JS
+
+
+def add_zoom_levels(m, levels, make_layer, name):
+    # levels: {zoom: GeoDataFrame}; make_layer builds the folium layer of one
+    # level. All levels share one FeatureGroup, so one LayerControl entry.
+    group = folium.FeatureGroup(name=name).add_to(m)
+    layers = [[zoom, make_layer(levels[zoom]).add_to(group)] for zoom in sorted(levels)]
+    ZoomLevels(group, layers).add_to(m)
+    return group
+
+
+def _cell(value, decimals):
+    if value is None or value != value:
+        return None
+    if isinstance(value, (int, float, np.number)):
+        return round(float(value), decimals)
+    return str(value)
+
+
+def score_table(frame, fields, decimals=SCORE_DECIMALS):
+    # {"fields": [...], "rows": [[...], ...]}, row i for feature id i; NaN -> null
+    rows = [[_cell(v, decimals) for v in values] for values in frame[list(fields)].itertuples(index=False)]
+    return {"fields": list(fields), "rows": rows}
+
+
+def add_states(m, states, fields, aliases, value_field="SuitabilityIndex", fill_color="YlGnBu", bins=6,
+               fill_opacity=0.7, line_weight=0.5, line_opacity=0.5, legend_name="", name="Suitability Index",
+               topology=None, quantization=QUANTIZATION, levels=None):
+    # Choropleth fill and hover tooltip on a single TopoJSON layer; bins are
+    # equal intervals over value_field, as folium.Choropleth draws them.
+    # levels ({zoom: GeoDataFrame}, rows aligned with states) embeds one
+    # topology per pyramid level instead; quantization may then be a
+    # {zoom: quantization} dict.
+    states = states.to_crs("EPSG:4326")
+    if levels is not None:
+        topologies = [[zoom, to_topology(levels[zoom].to_crs("EPSG:4326"), quantization=quantization[zoom]
+                                         if isinstance(quantization, dict) else quantization)]
+                      for zoom in sorted(levels)]
+    else:
+        topologies = [[0, topology if topology is not None else to_topology(states, quantization=quantization)]]
+    values = states[value_field].to_numpy(dtype=float)
+    _, edges = np.histogram(values[~np.isnan(values)], bins=bins)
+    colors = color_brewer(fill_color, n=len(edges) - 1)
+    style = {
+        "field": value_field, "bins": edges.tolist(), "colors": colors, "nan_color": "black",
+        "fill_opacity": fill_opacity, "line_weight": line_weight, "line_opacity": line_opacity,
+        "aliases": list(aliases), "tooltip_style": TOOLTIP_STYLE,
+    }
+    # Tooltip rows first; the fill value is appended when it is not one of them
+    columns = list(fields) + ([] if value_field in fields else [value_field])
+    layer = StateLayer(topologies, score_table(states, columns), style, name=name)
+    layer.add_to(m)
+    StepColormap(colors, index=edges.tolist(), vmin=edges[0], vmax=edges[-1], caption=legend_name).add_to(m)
+    return layer
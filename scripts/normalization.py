@@ -0,0 +1,163 @@
+# ================================================================
+# normalization.py
+# Column-wise factor normalization with persisted fit statistics
+# ================================================================
+# fit() computes per-column statistics of a factor matrix (rows = states
+# or cells, columns = raw factors) in one NumPy pass; transform() applies
+# them to the same rows or to new ones, so later data can be put on the
+# scale of an earlier fit without refitting. Strategies:
+#
+#   minmax   (x - min) / (max - min)
+#   zscore   (x - mean) / std
+#   rank     percentile rank among the fitted values, ties averaged
+#   robust   (x - q05) / (q95 - q05), clipped to [0, 1]
+#   log      minmax of log1p(x); negative values count as missing
+#
+# NaN stays NaN. A column without spread (every value equal) maps to
+# ``constant``. Columns listed in ``invert`` are flipped (1 - x, or -x
+# for zscore) so that higher always means more suitable. Statistics are
+# plain lists and round-trip through JSON (save_stats / load_stats).
+# ================================================================
+
+import json
+import warnings
+
+import numpy as np
+import pandas as pd
+
+STRATEGIES = ("minmax", "zscore", "rank", "robust", "log")
+ROBUST_QUANTILES = (0.05, 0.95)
+
+
+def _as_matrix(values):
+    matrix = np.array(values, dtype=float)
+    return matrix.reshape(-1, 1) if matrix.ndim == 1 else matrix
+
+
+def _prepare(matrix, strategy):
+    if strategy == "log":
+        with np.errstate(invalid="ignore"):
+            return np.log1p(np.where(matrix >= 0, matrix, np.nan))
+    return matrix
+
+
+# ------------------------------------------------
+# 1. Fit / transform
+# ------------------------------------------------
+def fit(values, strategy="minmax", columns=None, invert=(), constant=0.0):
+    if strategy not in STRATEGIES:
+        raise ValueError(f"unknown normalization strategy {strategy!r}; expected one of {STRATEGIES}")
+    matrix = _prepare(_as_matrix(values), strategy)
+    columns = list(range(matrix.shape[1])) if columns is None else list(columns)
+    stats = {"strategy": strategy, "columns": columns, "invert": [c in invert for c in columns],
+             "constant": constant}
+
+    with warnings.catch_warnings():
+        # All-NaN columns get NaN statistics, and every value stays NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        if strategy == "rank":
+            stats["sorted"] = [np.sort(col[~np.isnan(col)]).tolist() for col in matrix.T]
+            return stats
+        if strategy == "zscore":
+            center, scale = np.nanmean(matrix, axis=0), np.nanstd(matrix, axis=0)
+        elif strategy == "robust":
+            center, upper = np.nanquantile(matrix, ROBUST_QUANTILES, axis=0)
+            scale = upper - center
+        else:
+            center = np.nanmin(matrix, axis=0)
+            scale = np.nanmax(matrix, axis=0) - center
+    stats["center"], stats["scale"] = center.tolist(), scale.tolist()
+    return stats
+
+
+def _rank(matrix, fitted_columns):
+    out = np.empty(matrix.shape)
+    flat = np.zeros(matrix.shape[1], dtype=bool)
+    for j, fitted in enumerate(fitted_columns):
+        fitted = np.asarray(fitted, dtype=float)
+        flat[j] = fitted.size == 0 or fitted[0] == fitted[-1]
+        below = np.searchsorted(fitted, matrix[:, j], side="left")
+        upto = np.searchsorted(fitted, matrix[:, j], side="right")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[:, j] = np.clip((below + upto - 1) / 2 / (fitted.size - 1), 0, 1)
+    return out, flat
+
+
+def transform(values, stats):
+    strategy = stats["strategy"]
+    matrix = _prepare(_as_matrix(values), strategy)
+    if strategy == "rank":
+        out, flat = _rank(matrix, stats["sorted"])
+    else:
+        center = np.asarray(stats["center"], dtype=float)
+        scale = np.asarray(stats["scale"], dtype=float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = (matrix - center) / scale
+        if strategy == "robust":
+            out = np.clip(out, 0, 1)
+        flat = scale == 0
+
+    out[:, flat] = stats["constant"]
+    invert = np.asarray(stats["invert"], dtype=bool)
+    out[:, invert] = -out[:, invert] if strategy == "zscore" else 1 - out[:, invert]
+    out[np.isnan(matrix)] = np.nan
+    return out
+
+
+def fit_transform(values, strategy="minmax", columns=None, invert=(), constant=0.0):
+    stats = fit(values, strategy, columns, invert, constant)
+    return transform(values, stats), stats
+
+
+# ------------------------------------------------
+# 2. DataFrame helpers
+# ------------------------------------------------
+def normalize_columns(frame, columns, strategy="minmax", invert=(), constant=0.0, stats=None):
+    # columns maps raw column -> normalized column. Returns a copy of frame
+    # with the normalized columns added, and the statistics used.
+    raw = list(columns)
+    if stats is None:
+        stats = fit(frame[raw].to_numpy(dtype=float), strategy, raw, invert, constant)
+    normalized = transform(frame[stats["columns"]].to_numpy(dtype=float), stats)
+    frame = frame.copy()
+    for j, column in enumerate(stats["columns"]):
+        frame[columns[column]] = normalized[:, j]
+    return frame, stats
+
+
+def normalize_series(series, strategy="minmax", constant=0.0):
+    normalized, _ = fit_transform(series.to_numpy(dtype=float), strategy, constant=constant)
+    return pd.Series(normalized[:, 0], index=series.index, name=series.name)
+
+
+def save_stats(path, stats):
+    with open(path, "w") as f:
+        json.dump(stats, f, indent=2)
+
+
+def load_stats(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# ------------------------------------------------
+# 3. Single-column statistics
+# ------------------------------------------------
+STAT_KEYS = ("center", "scale", "sorted")
+
+
+def column_stats(stats, column):
+    # The statistics of one fitted column, usable with transform()
+    j = stats["columns"].index(column)
+    single = {**stats, "columns": [column], "invert": [stats["invert"][j]]}
+    single.update({key: [stats[key][j]] for key in STAT_KEYS if key in stats})
+    return single
+
+
+def set_column_stats(stats, single):
+    # Writes a refitted single column back into stats
+    j = stats["columns"].index(single["columns"][0])
+    for key in STAT_KEYS:
+        if key in stats:
+            stats[key][j] = single[key][0]
+    return stats
@@ -0,0 +1,111 @@
+# ================================================================
+# overlay.py
+# STRtree-backed polygon overlay and equal-area measurement
+# ================================================================
+# Used by full_pipeline.py section 7 (open coastal area) and by the
+# area-weighted NFHAP score of section 6 (--nfhap-weight area). Polygons are
+# reprojected to an equal-area CRS, simplified with a tolerance scaled
+# to each geometry's size, paired with the regions they touch through a
+# shapely STRtree, clipped to each region, and unioned per region before
+# measuring. A polygon that straddles two states is therefore split
+# between them rather than counted in full for both.
+# ================================================================
+
+import numpy as np
+import shapely
+
+# World Cylindrical Equal Area, valid for CONUS, Alaska, Hawaii and territories
+EQUAL_AREA_CRS = "EPSG:6933"
+
+# Simplification tolerance = SIMPLIFY_REL * bbox diagonal, capped at SIMPLIFY_MAX_M
+SIMPLIFY_REL = 1e-4
+SIMPLIFY_MAX_M = 100.0
+
+
+def geometry_array(gdf):
+    # GeoDataFrame / GeoSeries -> plain object array of shapely geometries
+    return np.asarray(gdf.geometry, dtype=object)
+
+
+def adaptive_simplify(geoms, rel=SIMPLIFY_REL, max_tol=SIMPLIFY_MAX_M):
+    # Large polygons lose more vertices than small ones; invalid inputs are repaired
+    bounds = shapely.bounds(geoms)
+    diag = np.hypot(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1])
+    tol = np.nan_to_num(np.minimum(diag * rel, max_tol))
+    simplified = shapely.simplify(geoms, tol, preserve_topology=True)
+    invalid = ~shapely.is_valid(simplified)
+    if invalid.any():
+        simplified[invalid] = shapely.make_valid(simplified[invalid])
+    return simplified
+
+
+class OverlayLayer:
+    # Simplified geometries plus their STRtree, built once and reused when
+    # the same layer is clipped against many batches of regions (grid cells)
+    def __init__(self, geoms, simplify=True):
+        self.geoms = adaptive_simplify(geoms) if simplify else np.asarray(geoms, dtype=object)
+        self.tree = shapely.STRtree(self.geoms)
+
+
+def as_layer(geoms):
+    return geoms if isinstance(geoms, OverlayLayer) else OverlayLayer(geoms)
+
+
+def clip_pairs(regions, layer):
+    # Returns (region index, layer index, clipped geometry) for every intersecting pair
+    region_idx, geom_idx = layer.tree.query(regions, predicate="intersects")
+    shapely.prepare(regions)
+    clipped = layer.geoms[geom_idx]
+    # Only geometries that cross a region boundary need an actual intersection
+    crossing = ~shapely.contains_properly(regions[region_idx], clipped)
+    clipped[crossing] = shapely.intersection(clipped[crossing], regions[region_idx[crossing]])
+    return region_idx, geom_idx, clipped
+
+
+def clip_to_regions(regions, layer):
+    region_idx, _, clipped = clip_pairs(regions, layer)
+    return region_idx, clipped
+
+
+def clipped_measure(clipped, source):
+    # Area of clipped polygons, length of clipped lines; the source geometry's
+    # dimension decides, so a polygon that only touches a border measures 0
+    lines = shapely.get_dimensions(source) == 1
+    return np.where(lines, shapely.length(clipped), shapely.area(clipped))
+
+
+def union_by_region(n_regions, region_idx, clipped):
+    unions = np.full(n_regions, None, dtype=object)
+    order = np.argsort(region_idx, kind="stable")
+    region_idx, clipped = region_idx[order], clipped[order]
+    starts = np.flatnonzero(np.diff(region_idx, prepend=-1))
+    for start, stop in zip(starts, np.append(starts[1:], len(region_idx))):
+        unions[region_idx[start]] = shapely.union_all(clipped[start:stop])
+    return unions
+
+
+def open_area_km2(regions, cover, exclude):
+    # Per region: area of (cover ∩ region) - (union of exclude ∩ region), in km².
+    # Inputs are geometry arrays (or OverlayLayers) already in an equal-area CRS.
+    n = len(regions)
+    cover_union = union_by_region(n, *clip_to_regions(regions, as_layer(cover)))
+    exclude_union = union_by_region(n, *clip_to_regions(regions, as_layer(exclude)))
+
+    has_cover = ~shapely.is_missing(cover_union)
+    has_exclude = ~shapely.is_missing(exclude_union)
+    cover_area = np.zeros(n)
+    exclude_area = np.zeros(n)
+    open_area = np.zeros(n)
+    cover_area[has_cover] = shapely.area(cover_union[has_cover])
+    exclude_area[has_exclude] = shapely.area(exclude_union[has_exclude])
+
+    both = has_cover & has_exclude
+    open_area[has_cover] = cover_area[has_cover]
+    open_area[both] = shapely.area(shapely.difference(cover_union[both], exclude_union[both]))
+
+    return {
+        "cover_km2": cover_area / 1e6,
+        "exclude_km2": exclude_area / 1e6,
+        "open_km2": open_area / 1e6,
+        "has_cover": has_cover,
+    }
@@ -1,15 +1,16 @@
+import mmap
+import os
 import re
 import pandas as pd
 import sys
+from pathlib import Path
 
-# ---- USER PARAMETERS ----
-REPORT_TYPE = sys.argv[1].lower()  # 'algae', 'finfish', or 'shellfish'
-TEXT_FILE = sys.argv[2]            # input txt file
-OUTPUT_CSV = TEXT_FILE.rsplit(".txt", 1)[0] + "_parsed.csv"
-
-# ---- Load text ----
-with open(TEXT_FILE, "r", encoding="utf-8") as f:
-    text = f.read()
+# ---- Usage ----
+#   python parse_state_texts.py <algae|finfish|shellfish> report.txt
+#       -> report_parsed.csv (one row per state)
+#   python parse_state_texts.py --batch combined.csv report1.txt report2.txt ...
+#       -> one long-format table over every report type and year; the type
+#          and year are inferred from each file name
 
 # ---- Full list of US states ----
 ALL_US_STATES = [
@@ -22,88 +23,175 @@ ALL_US_STATES = [
     "Texas", "Utah", "Vermont", "Virginia", "Washington", "West Virginia", "Wisconsin", "Wyoming"
 ]
 
-# ---- Determine section header based on report type ----
-if REPORT_TYPE == 'algae':
-    SECTION_HEADER = r'Summary of the Status of Algae Culture'
-elif REPORT_TYPE == 'finfish':
-    SECTION_HEADER = r'Summary of the Status of Finfish Culture'
-elif REPORT_TYPE == 'shellfish':
-    SECTION_HEADER = r'Special Notes'
-else:
-    raise ValueError("REPORT_TYPE must be 'algae', 'finfish', or 'shellfish'")
+# ---- Section header for each report type ----
+SECTION_HEADERS = {
+    'algae': r'Summary of the Status of Algae Culture',
+    'finfish': r'Summary of the Status of Finfish Culture',
+    'shellfish': r'Special Notes',
+}
 
-# ---- Find state sections ----
+LAW_COL = "aquaculture leasing/permitting law(s)"
+FEE_COL = "Application Fees"
+TIME_COL = "Lease Review/Approval Timeframe"
+
+# ---- Precompiled patterns ----
+# Section headers are matched on the raw bytes of the memory-mapped file
 # Escape spaces in state names for regex
-escaped_states = [re.escape(s) for s in ALL_US_STATES]
-pattern = r'(?<=\n)(' + '|'.join(escaped_states) + r')\n' + SECTION_HEADER
-matches = list(re.finditer(pattern, text))
-
-# Map state -> section text
-sections = {}
-for i, m in enumerate(matches):
-    start = m.end()
-    end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
-    state_name = m.group(1)
-    sections[state_name] = text[start:end].strip()
+STATE_ALTERNATION = '|'.join(re.escape(s) for s in ALL_US_STATES)
+SECTION_PATTERNS = {
+    report_type: re.compile((r'(?<=\n)(' + STATE_ALTERNATION + r')\r?\n' + header).encode())
+    for report_type, header in SECTION_HEADERS.items()
+}
+LAW_MARKER = re.compile(r'leasing/permitting law\(s\):', re.I)
+FEE_AMOUNT = re.compile(r'\$(\d[\d,\.]*)')
+TIME_AMOUNT = re.compile(r'(\d+\.?\d*)\s*(years|months)', re.I)
+YEAR_IN_NAME = re.compile(r'(?:19|20)\d{2}')
 
-# ---- Parse each state ----
-parsed_data = []
-
-for state in ALL_US_STATES:
-    content = sections.get(state, "")
-    if not content:
-        parsed_data.append({
-            "state": state,
-            "aquaculture leasing/permitting law(s)": "N/A",
-            "Application Fees": "N/A",
-            "Lease Review/Approval Timeframe": "N/A"
-        })
-        continue
-
-    lines = content.splitlines()
+FEE_WINDOW = 20
+TIME_WINDOW = 10
+
+
+def report_type_from_name(path):
+    name = Path(path).name.lower()
+    if "algae" in name or "seaweed" in name:
+        return "algae"
+    if "finfish" in name:
+        return "finfish"
+    if "shellfish" in name:
+        return "shellfish"
+    raise ValueError(f"Cannot infer report type from file name: {path}")
+
+
+def year_from_name(path):
+    years = YEAR_IN_NAME.findall(Path(path).name)
+    return int(years[-1]) if years else None
+
+
+# ---- Find state sections ----
+def iter_sections(text_file, report_type):
+    # Yields (state, section text) one at a time from a memory-mapped file.
+    # Boundaries are found with one incremental search per header, and only
+    # the current section is ever decoded, so memory does not grow with
+    # the size of the file.
+    if report_type not in SECTION_PATTERNS:
+        raise ValueError("REPORT_TYPE must be 'algae', 'finfish', or 'shellfish'")
+    pattern = SECTION_PATTERNS[report_type]
+
+    with open(text_file, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            current = None
+            pos = 0
+            while True:
+                # Copy out plain values so no match object keeps the map exported
+                m = pattern.search(mm, pos)
+                found = (m.group(1).decode(), m.start(), m.end()) if m else None
+                del m
+                if current is not None:
+                    state, start = current
+                    end = found[1] if found else len(mm)
+                    yield state, mm[start:end].decode("utf-8").strip()
+                if found is None:
+                    break
+                current = (found[0], found[2])
+                pos = found[2]
+
+
+# ---- Parse one state section ----
+def parse_section(content):
+    # Single pass over the lines: each field is keyed off the first line
+    # carrying its marker, then reads a fixed window of the lines after it.
     law_value = "N/A"
+    fee_numbers = None
+    time_matches = None
+    law_idx = fee_idx = time_idx = None
+
+    for i, line in enumerate(content.splitlines()):
+        # ---- Laws: decided by the line right after the marker ----
+        if law_idx is not None and i == law_idx + 1:
+            law_value = "NO" if "have not been developed" in line.strip().lower() else "YES"
+        # ---- Application Fees: dollar amounts in the next 20 lines ----
+        if fee_idx is not None and i <= fee_idx + FEE_WINDOW:
+            fee_numbers.extend(float(n.replace(",", "")) for n in FEE_AMOUNT.findall(line))
+        # ---- Lease Review/Approval Timeframe: durations in the next 10 lines ----
+        if time_idx is not None and i <= time_idx + TIME_WINDOW:
+            time_matches.extend(f"{num} {unit}" for num, unit in TIME_AMOUNT.findall(line))
+
+        if law_idx is None and LAW_MARKER.search(line):
+            law_idx = i
+        if fee_idx is None and "Application Fees" in line:
+            fee_idx = i
+            fee_numbers = []
+        if time_idx is None and "Lease Review/Approval Timeframe" in line:
+            time_idx = i
+            time_matches = []
+
+        if (law_idx is not None and i > law_idx and fee_idx is not None and i >= fee_idx + FEE_WINDOW
+                and time_idx is not None and i >= time_idx + TIME_WINDOW):
+            break
+
     fee_value = "N/A"
-    timeframe_value = "N/A"
-
-    # ---- Laws ----
-    law_idx = next((i for i, l in enumerate(lines) if re.search(r'leasing/permitting law\(s\):', l, re.I)), None)
-    if law_idx is not None and law_idx + 1 < len(lines):
-        next_line = lines[law_idx + 1].strip().lower()
-        if "have not been developed" in next_line:
-            law_value = "NO"
-        else:
-            law_value = "YES"
-
-    # ---- Application Fees ----
-    fee_idx = next((i for i, l in enumerate(lines) if "Application Fees" in l), None)
-    if fee_idx is not None:
-        next_20 = lines[fee_idx + 1: fee_idx + 21]
-        fee_numbers = []
-        for line in next_20:
-            nums = re.findall(r'\$(\d[\d,\.]*)', line)
-            for n in nums:
-                fee_numbers.append(float(n.replace(",", "")))
+    if fee_numbers is not None:
         fee_value = sum(fee_numbers) if fee_numbers else "No"
+    timeframe_value = "; ".join(time_matches) if time_matches else "N/A"
+
+    return {
+        LAW_COL: law_value,
+        FEE_COL: fee_value,
+        TIME_COL: timeframe_value
+    }
+
+
+# ---- Parse each state ----
+def iter_records(text_file, report_type):
+    # One parsed record per state section, in file order
+    for state, content in iter_sections(text_file, report_type):
+        yield {"state": state, **parse_section(content)}
+
+
+def parse_file(text_file, report_type):
+    # One row per state in ALL_US_STATES order; a state seen more than once
+    # keeps its last section, a state never seen is all "N/A"
+    records = {record["state"]: record for record in iter_records(text_file, report_type)}
+    parsed_data = [
+        records.get(state, {"state": state, LAW_COL: "N/A", FEE_COL: "N/A", TIME_COL: "N/A"})
+        for state in ALL_US_STATES
+    ]
+    return pd.DataFrame(parsed_data)
+
+
+def parse_batch(text_files):
+    # All report types and years in one process, stacked in long format
+    frames = []
+    for text_file in text_files:
+        df = parse_file(text_file, report_type_from_name(text_file))
+        df.insert(0, "source", Path(text_file).name)
+        df.insert(0, "year", year_from_name(text_file))
+        df.insert(0, "report_type", report_type_from_name(text_file))
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[0] == "--batch":
+        OUTPUT_CSV = argv[1]
+        TEXT_FILES = argv[2:]
+        df = parse_batch(TEXT_FILES)
+        df.to_csv(OUTPUT_CSV, index=False)
+        print(f"✅ Parsed {len(TEXT_FILES)} reports ({len(df)} state rows). Saved to {OUTPUT_CSV}")
+    else:
+        # ---- USER PARAMETERS ----
+        REPORT_TYPE = argv[0].lower()  # 'algae', 'finfish', or 'shellfish'
+        TEXT_FILE = argv[1]            # input txt file
+        OUTPUT_CSV = TEXT_FILE.rsplit(".txt", 1)[0] + "_parsed.csv"
+
+        # ---- Save CSV ----
+        df = parse_file(TEXT_FILE, REPORT_TYPE)
+        df.to_csv(OUTPUT_CSV, index=False)
+        print(f"✅ Parsed all {len(df)} states. Saved to {OUTPUT_CSV}")
+
 
-    # ---- Lease Review/Approval Timeframe ----
-    timeframe_idx = next((i for i, l in enumerate(lines) if "Lease Review/Approval Timeframe" in l), None)
-    if timeframe_idx is not None:
-        next_10 = lines[timeframe_idx + 1: timeframe_idx + 11]
-        time_matches = []
-        for line in next_10:
-            matches_ = re.findall(r'(\d+\.?\d*)\s*(years|months)', line, re.I)
-            time_matches.extend([f"{num} {unit}" for num, unit in matches_])
-        if time_matches:
-            timeframe_value = "; ".join(time_matches)
-
-    parsed_data.append({
-        "state": state,
-        "aquaculture leasing/permitting law(s)": law_value,
-        "Application Fees": fee_value,
-        "Lease Review/Approval Timeframe": timeframe_value
-    })
-
-# ---- Save CSV ----
-df = pd.DataFrame(parsed_data)
-df.to_csv(OUTPUT_CSV, index=False)
-print(f"✅ Parsed all {len(df)} states. Saved to {OUTPUT_CSV}")
+if __name__ == "__main__":
+    main()
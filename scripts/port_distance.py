@@ -0,0 +1,89 @@
+# ================================================================
+# port_distance.py
+# Nearest-port distances from a cached KD-tree over ne_10m_ports
+# ================================================================
+# Ports are stored as unit vectors on the sphere, so Euclidean nearest
+# neighbours in the KD-tree are exactly the great-circle (haversine)
+# nearest neighbours; chord lengths are converted back to km. Every
+# port is indexed (name column only): no fixed box can promise to keep
+# the nearest port of Guam, American Samoa or the western Aleutians, and
+# the layer is small. The built index is pickled under
+# data_processed/port_index/, keyed by the size and mtime of the
+# shapefile parts, so repeated pipeline runs and interactive queries
+# skip both the read and the rebuild.
+#
+# Usage:
+#   python port_distance.py LON LAT [K]
+# ================================================================
+
+import hashlib
+import json
+import pickle
+import sys
+from pathlib import Path
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from raw_layers import read_layer
+from stage_graph import expand_inputs
+
+EARTH_RADIUS_KM = 6371.0088
+
+data_dir = Path("../data_raw")
+out_dir = Path("../data_processed")
+PORTS_FILE = data_dir / "ne_10m_ports.shp"
+INDEX_DIR = out_dir / "port_index"
+
+
+def unit_vectors(lon, lat):
+    lon, lat = np.radians(np.asarray(lon, dtype=float)), np.radians(np.asarray(lat, dtype=float))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+class PortIndex:
+    def __init__(self, lon, lat, names=None):
+        self.lon = np.asarray(lon, dtype=float)
+        self.lat = np.asarray(lat, dtype=float)
+        self.names = np.asarray(names if names is not None else [""] * len(self.lon), dtype=object)
+        self.tree = cKDTree(unit_vectors(self.lon, self.lat))
+
+    def query(self, lon, lat, k=1):
+        # Great-circle distance (km) and port index of the k nearest ports, shape (n, k)
+        chord, idx = self.tree.query(unit_vectors(lon, lat), k=k)
+        chord, idx = np.atleast_1d(chord), np.atleast_1d(idx)
+        if k == 1:
+            chord, idx = chord[..., None], idx[..., None]
+        dist = 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+        return dist.reshape(-1, k), idx.reshape(-1, k)
+
+
+def load_port_index(ports_file=PORTS_FILE, index_dir=INDEX_DIR):
+    index_dir = Path(index_dir)
+    stamp = [(p.name, p.stat().st_size, p.stat().st_mtime_ns) for p in expand_inputs([ports_file])]
+    key = hashlib.sha256(json.dumps(stamp).encode()).hexdigest()[:16]
+    path = index_dir / f"ports-{key}.pkl"
+    if path.exists():
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    ports = read_layer(ports_file, columns=["name"]).to_crs("EPSG:4326")
+    index = PortIndex(ports.geometry.x, ports.geometry.y,
+                      ports["name"] if "name" in ports.columns else None)
+
+    index_dir.mkdir(parents=True, exist_ok=True)
+    for old in index_dir.glob("ports-*.pkl"):
+        old.unlink()
+    with open(path, "wb") as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return index
+
+
+if __name__ == "__main__":
+    LON, LAT = float(sys.argv[1]), float(sys.argv[2])
+    K = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    index = load_port_index()
+    dist, idx = index.query([LON], [LAT], k=K)
+    for d, i in zip(dist[0], idx[0]):
+        print(f"{index.names[i] or 'Unknown'}: {d:.1f} km")
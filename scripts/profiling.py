@@ -0,0 +1,150 @@
+# ================================================================
+# profiling.py
+# Per-stage wall time, CPU time, memory and row-count instrumentation
+# ================================================================
+# StageProfiler.stage(name) is a context manager that records, for the
+# block it wraps:
+#
+#   wall_s, cpu_s       elapsed and process CPU time
+#   rss_mb, peak_rss_mb resident memory after the block and the process
+#                       high-water mark so far (per worker process when
+#                       stages run in a pool)
+#   rows                set by the caller on the yielded record
+#   py_peak_mb          peak Python allocations (tracemalloc, optional)
+#   cprofile            path of a cProfile dump for the block (optional),
+#                       under a cprofile-<run start>/ directory per run
+#
+# When the profiler is disabled, stage() returns a null context and
+# nothing is measured, so it can stay wired in permanently.
+# report() writes the records to data_processed/profile/ as JSON and
+# summary() formats them as a table.
+# ================================================================
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+
+out_dir = Path("../data_processed")
+PROFILE_DIR = out_dir / "profile"
+
+MB = 1 << 20
+
+
+def rss_mb():
+    import psutil
+    return psutil.Process().memory_info().rss / MB
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        # Windows: psutil reports the peak working set directly
+        import psutil
+        return psutil.Process().memory_info().peak_wset / MB
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+
+class StageProfiler:
+    def __init__(self, enabled=False, cprofile=False, trace_memory=False, profile_dir=PROFILE_DIR):
+        self.enabled = enabled or cprofile or trace_memory
+        self.cprofile = cprofile
+        self.trace_memory = trace_memory
+        self.profile_dir = Path(profile_dir)
+        self.records = []
+        self.started = datetime.now()
+        self._wall0 = time.perf_counter()
+
+    def stage(self, name, **info):
+        # Yields a dict; callers may set record["rows"] inside the block
+        if not self.enabled:
+            return nullcontext({})
+        return self._measure(name, **info)
+
+    @contextmanager
+    def _measure(self, name, **info):
+        import tracemalloc
+
+        record = {"stage": name, **info, "pid": os.getpid()}
+        profiler = None
+        if self.cprofile:
+            import cProfile
+            profiler = cProfile.Profile()
+        if self.trace_memory:
+            # Restarting is the only way to reset the peak before Python 3.9
+            tracemalloc.stop()
+            tracemalloc.start()
+
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record["wall_s"] = time.perf_counter() - wall0
+            record["cpu_s"] = time.process_time() - cpu0
+            record["rss_mb"] = rss_mb()
+            record["peak_rss_mb"] = peak_rss_mb()
+            if self.trace_memory:
+                record["py_peak_mb"] = tracemalloc.get_traced_memory()[1] / MB
+                tracemalloc.stop()
+            if profiler is not None:
+                # Worker processes get a copy of self.started, so a run's dumps share one directory
+                path = self.profile_dir / f"cprofile-{self.started:%Y%m%d-%H%M%S}" / f"{name}.prof"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(str(path))
+                record["cprofile"] = str(path)
+            self.records.append(record)
+
+    def call(self, name, func, *args, **kwargs):
+        # Runs func under stage(name); returns (result, record or None). Used in
+        # worker processes, whose records are shipped back to the parent.
+        with self.stage(name, status="computed") as record:
+            result = func(*args, **kwargs)
+            record["rows"] = len(result)
+        return result, (record if self.enabled else None)
+
+    def add(self, record):
+        if record is not None:
+            self.records.append(record)
+
+    # ------------------------------------------------
+    # Output
+    # ------------------------------------------------
+    def report(self, argv=None):
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        path = self.profile_dir / f"profile-{self.started:%Y%m%d-%H%M%S}.json"
+        report = {
+            "started": self.started.isoformat(timespec="seconds"),
+            "argv": list(sys.argv if argv is None else argv),
+            "total_wall_s": time.perf_counter() - self._wall0,
+            "stages": self.records,
+        }
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return path
+
+    def summary(self):
+        header = f"{'stage':<16}{'status':<20}{'rows':>8}{'wall s':>9}{'cpu s':>9}{'rss MB':>9}{'peak MB':>9}"
+        if self.trace_memory:
+            header += f"{'py MB':>9}"
+        lines = [header, "-" * len(header)]
+        for r in self.records:
+            rows = "" if r.get("rows") is None else r["rows"]
+            status = r.get("status", "")
+            if r.get("cache") not in (None, "hit"):
+                status += f" ({r['cache']})"
+            line = (f"{r['stage']:<16}{status:<20}{rows:>8}{r['wall_s']:>9.2f}"
+                    f"{r['cpu_s']:>9.2f}{r['rss_mb']:>9.0f}{r['peak_rss_mb']:>9.0f}")
+            if self.trace_memory:
+                line += f"{r.get('py_peak_mb', 0):>9.1f}"
+            lines.append(line)
+        return "\n".join(lines)
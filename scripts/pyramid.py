@@ -0,0 +1,144 @@
+# ================================================================
+# pyramid.py
+# Zoom-aware, topology-preserving simplification pyramid
+# ================================================================
+# Each polygon layer is simplified once per zoom level with a tolerance
+# of SIMPLIFY_PX screen pixels at that zoom, instead of one fixed
+# tolerance for every layer and every view. Borders are simplified as
+# shared arcs (TopoJSON-style): the boundaries of all polygons are noded
+# into arcs, each arc is simplified exactly once, and the polygons are
+# rebuilt from the simplified arcs, so neighbouring states still meet
+# along the same line with no gaps or slivers between them.
+#
+# Levels are cached one file per zoom as GeoParquet under
+# data_processed/pyramid/, keyed by the size and mtime of the source
+# files, so consumers asking for different zooms share what is built
+# and only the zooms someone asks for are ever simplified. A consumer
+# picks a level with pyramid_level(levels, zoom): the lightweight
+# dashboard embeds a few levels and swaps them as the map zooms
+# (map_layers.py), the vector tile export reads one level per tile zoom.
+#
+# Usage:
+#   python pyramid.py            (pre-builds the dashboard layers)
+# ================================================================
+
+import hashlib
+import json
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from overlay import geometry_array, union_by_region
+from stage_graph import expand_inputs
+
+out_dir = Path("../data_processed")
+PYRAMID_DIR = out_dir / "pyramid"
+
+ZOOMS = (2, 4, 6, 8, 10)
+# Tolerance in screen pixels at each zoom (256 px web-map tiles)
+SIMPLIFY_PX = 0.5
+# A rebuilt face belongs to every source polygon covering at least this share of it
+FACE_OVERLAP = 0.5
+
+
+def zoom_tolerance(zoom, px=SIMPLIFY_PX):
+    # Degrees per screen pixel at the equator, times px
+    return 360.0 / (256 * 2 ** zoom) * px
+
+
+# ------------------------------------------------
+# 1. Shared-arc simplification
+# ------------------------------------------------
+def shared_arcs(geoms):
+    # Polygon boundaries noded at every junction and merged into maximal arcs
+    linework = shapely.union_all(shapely.boundary(geoms[~shapely.is_empty(geoms)]))
+    return shapely.get_parts(shapely.line_merge(linework))
+
+
+def topo_simplify(geoms, tolerance):
+    # Simplifies polygons through their shared arcs; geoms are in the CRS of tolerance
+    geoms = np.asarray(geoms, dtype=object)
+    arcs = shapely.simplify(shared_arcs(geoms), tolerance, preserve_topology=True)
+    # Re-node: independently simplified arcs may now cross
+    faces = shapely.get_parts(shapely.polygonize(shapely.get_parts(shapely.union_all(arcs))))
+
+    tree = shapely.STRtree(geoms)
+    face_idx, geom_idx = tree.query(faces, predicate="intersects")
+    overlap = shapely.area(shapely.intersection(faces[face_idx], geoms[geom_idx]))
+    keep = overlap >= FACE_OVERLAP * shapely.area(faces[face_idx])
+    simplified = union_by_region(len(geoms), geom_idx[keep], faces[face_idx[keep]])
+
+    # Polygons that lost every face (collapsed islands) fall back to a plain simplify
+    missing = shapely.is_missing(simplified)
+    simplified[missing] = shapely.simplify(geoms[missing], tolerance, preserve_topology=True)
+    return simplified
+
+
+def simplify_layer(gdf, tolerance, shared=True):
+    out = gdf.copy()
+    geoms = geometry_array(gdf)
+    if shared:
+        out["geometry"] = topo_simplify(geoms, tolerance)
+    else:
+        out["geometry"] = shapely.simplify(geoms, tolerance, preserve_topology=True)
+    return out
+
+
+# ------------------------------------------------
+# 2. Cached pyramid
+# ------------------------------------------------
+def pyramid_key(name, sources, shared):
+    stamp = [(p.name, p.stat().st_size, p.stat().st_mtime_ns) for p in expand_inputs(sources)]
+    spec = {"name": name, "sources": stamp, "px": SIMPLIFY_PX, "shared": shared}
+    return hashlib.sha256(json.dumps(spec).encode()).hexdigest()[:16]
+
+
+def load_pyramid(name, sources, read, zooms=ZOOMS, shared=True, pyramid_dir=PYRAMID_DIR):
+    # Returns {zoom: GeoDataFrame in EPSG:4326}; read() loads the full-resolution
+    # layer and is only called when a requested level is not cached
+    pyramid_dir = Path(pyramid_dir)
+    key = pyramid_key(name, sources, shared)
+    paths = {z: pyramid_dir / f"{name}-{key}-z{z}.parquet" for z in zooms}
+    levels = {z: gpd.read_parquet(p) for z, p in paths.items() if p.exists()}
+    missing = [z for z in paths if z not in levels]
+    if not missing:
+        return levels
+
+    gdf = read().to_crs("EPSG:4326")
+    pyramid_dir.mkdir(parents=True, exist_ok=True)
+    # Levels of an older version of the sources are stale
+    for old in pyramid_dir.glob(f"{name}-*.parquet"):
+        if not old.name.startswith(f"{name}-{key}-"):
+            old.unlink()
+    for z in missing:
+        levels[z] = simplify_layer(gdf, zoom_tolerance(z), shared)
+        levels[z].to_parquet(paths[z])
+    return {z: levels[z] for z in sorted(levels)}
+
+
+def pyramid_level(levels, zoom):
+    # Coarsest level still detailed enough for the zoom (finest level past the top)
+    fits = [z for z in levels if z >= zoom]
+    return levels[min(fits) if fits else max(levels)]
+
+
+if __name__ == "__main__":
+    from factor_store import RAW_LAYERS, load_layer, read_table, table_path
+
+    # The same views the lightweight dashboard and vector_tiles.py read
+    layers = {
+        "states": ([table_path("suitability")],
+                   lambda: read_table("suitability", columns=["state", "SuitabilityIndex", "EnvQuality_norm",
+                                                              "perm_norm", "total_sales_$1000_norm",
+                                                              "program_norm", "OpenCoast_norm", "port_norm"])),
+        "czma": ([RAW_LAYERS["czma"]], lambda: load_layer("czma", columns=["CZMADomain"])),
+        "sanctuaries": ([RAW_LAYERS["sanctuaries"]], lambda: load_layer("sanctuaries", columns=["siteName"])),
+    }
+    for name, (sources, read) in layers.items():
+        levels = load_pyramid(name, sources, read)
+        sizes = ", ".join(f"z{z}: {shapely.get_num_coordinates(geometry_array(g)).sum()}"
+                          for z, g in levels.items())
+        print(f"  {name} vertices -> {sizes}")
+    print(f"✅ Geometry pyramid saved to {PYRAMID_DIR}")
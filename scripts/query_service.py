@@ -0,0 +1,324 @@
+# ================================================================
+# query_service.py
+# Local HTTP service for suitability queries
+# ================================================================
+# Loads the suitability table from the factor store once (attributes
+# only, through pyarrow; geopandas is never imported), keeps the factor
+# matrix and the ranks under INDEX_WEIGHTS in memory, and answers from
+# there. Scores and ranks of recent weight scenarios are kept in an LRU
+# cache. The table is polled and reloaded (cache cleared) whenever the
+# pipeline or incremental.py rewrites it; a half-written file is simply
+# retried on the next poll. Every response carries a Server-Timing
+# header with the time spent answering.
+#
+#   GET /health
+#   GET /rank?weights=perm_norm:0.5,port_norm:0.5&policy=renormalize
+#            &k=5&filter=perm_norm>0.4&filter=program_norm>=0.2&coastal=1
+#       states by score under the given weights (default INDEX_WEIGHTS;
+#       factors not listed weigh 0), optionally filtered on any numeric
+#       column and to coastal states (OpenCoast_km2 > 0); ranks are over
+#       all states
+#   GET /state/Maine[?weights=...]
+#       factor values, weighted contributions, score and rank of one
+#       state (name, USPS abbreviation or FIPS code)
+#
+# Usage (from scripts/):
+#   python query_service.py [--host 127.0.0.1] [--port 8765] [--cache 256]
+# ================================================================
+
+import argparse
+import asyncio
+import json
+import math
+import re
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+from factor_store import BBOX_COLUMNS, table_path
+from index_engine import INDEX_WEIGHTS, NAN_POLICIES, rank_scores, score_scenarios
+from regions import US_STATES, region_key
+
+HOST = "127.0.0.1"
+PORT = 8765
+CACHE_SIZE = 256
+RELOAD_INTERVAL_S = 1.0
+# Section-10 policy: a state missing a weighted factor has no score
+DEFAULT_POLICY = "propagate"
+
+FILTER_PATTERN = re.compile(r"^(.+?)(>=|<=|==|!=|>|<)([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)$")
+OPERATORS = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal,
+             "==": np.equal, "!=": np.not_equal}
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               500: "Internal Server Error"}
+
+
+class QueryError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _number(value):
+    value = float(value)
+    return None if value != value else value
+
+
+class Scenario:
+    # Scores, ranks and best-first order of the states under one weighting
+    def __init__(self, X, weights, policy):
+        self.weights = weights
+        self.scores = score_scenarios(X, np.array([weights]), policy)[0]
+        self.ranks = rank_scores(self.scores)[0]
+        self.order = np.argsort(np.where(np.isnan(self.ranks), np.inf, self.ranks), kind="stable")
+
+
+# ------------------------------------------------
+# 1. In-memory model
+# ------------------------------------------------
+class SuitabilityModel:
+    def __init__(self, table="suitability", cache_size=CACHE_SIZE):
+        self.path = table_path(table)
+        self.cache_size = cache_size
+        self.factors = list(INDEX_WEIGHTS)
+        self.base_weights = tuple(float(INDEX_WEIGHTS[f]) for f in self.factors)
+        self.load()
+
+    def stamp(self):
+        stat = self.path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self):
+        import pyarrow.parquet as pq
+
+        # Everything is built in locals and assigned at the end, so a reload
+        # that fails part way leaves the previous model whole
+        stamp = self.stamp()
+        names = [c for c in pq.read_schema(self.path).names if c != "geometry" and c not in BBOX_COLUMNS]
+        frame = pq.read_table(self.path, columns=names).to_pandas()
+        states = frame["state"].astype(str).tolist()
+        # Plain arrays, so a query never touches pandas
+        columns = {c: frame[c].to_numpy(dtype=float) for c in names
+                   if c != "state" and frame[c].dtype.kind in "biuf"}
+        X = np.column_stack([columns[f] for f in self.factors])
+        row_of = {code: row for row, code in enumerate(US_STATES.codes(states)) if code >= 0}
+        base = Scenario(X, self.base_weights, DEFAULT_POLICY)
+
+        self.states, self.columns, self.X, self.row_of = states, columns, X, row_of
+        self.cache = OrderedDict([((self.base_weights, DEFAULT_POLICY), base)])
+        self.base = base
+        self.version = stamp
+        self.loaded_at = time.time()
+
+    def reload_if_changed(self):
+        try:
+            changed = self.stamp() != self.version
+        except FileNotFoundError:
+            return False
+        if changed:
+            self.load()
+        return changed
+
+    def scenario(self, weights, policy):
+        key = (weights, policy)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        result = self.cache[key] = Scenario(self.X, weights, policy)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
+
+    # ------------------------------------------------
+    # Query parameters
+    # ------------------------------------------------
+    def parse_scenario(self, params):
+        policy = params.get("policy", [DEFAULT_POLICY])[-1]
+        if policy not in NAN_POLICIES:
+            raise QueryError(f"policy must be one of {NAN_POLICIES}")
+        if "weights" not in params:
+            return self.scenario(self.base_weights, policy)
+        weights = dict.fromkeys(self.factors, 0.0)
+        for item in params["weights"][-1].split(","):
+            factor, sep, value = item.rpartition(":")
+            if not sep:
+                raise QueryError(f"bad weight {item!r}; expected factor:weight")
+            if factor not in weights:
+                raise QueryError(f"unknown factor {factor!r}; expected one of {self.factors}")
+            try:
+                weights[factor] = float(value)
+            except ValueError:
+                raise QueryError(f"weight for {factor!r} is not a number: {value!r}")
+            # float() also accepts "nan" and "inf"
+            if not math.isfinite(weights[factor]) or weights[factor] < 0:
+                raise QueryError(f"weight for {factor!r} must be a finite number >= 0: {value!r}")
+        return self.scenario(tuple(weights[f] for f in self.factors), policy)
+
+    def parse_mask(self, params):
+        mask = np.ones(len(self.states), dtype=bool)
+        for expression in params.get("filter", []):
+            match = FILTER_PATTERN.match(expression.replace(" ", ""))
+            if not match or match.group(1) not in self.columns:
+                raise QueryError(f"bad filter {expression!r}; use <column><op><number> on one of "
+                                 f"{sorted(self.columns)}")
+            column, op, value = match.groups()
+            with np.errstate(invalid="ignore"):
+                mask &= OPERATORS[op](self.columns[column], float(value))
+        if params.get("coastal", ["0"])[-1].lower() in ("1", "true", "yes"):
+            with np.errstate(invalid="ignore"):
+                mask &= self.columns["OpenCoast_km2"] > 0
+        return mask
+
+    # ------------------------------------------------
+    # Endpoints
+    # ------------------------------------------------
+    def health(self, params):
+        return {"states": len(self.states), "factors": self.factors, "cached_scenarios": len(self.cache),
+                "loaded_at": self.loaded_at, "table": str(self.path)}
+
+    def rank(self, params):
+        scenario = self.parse_scenario(params)
+        mask = self.parse_mask(params)
+        try:
+            k = int(params.get("k", [len(self.states)])[-1])
+        except ValueError:
+            raise QueryError("k must be an integer")
+        order = scenario.order[mask[scenario.order]]
+        return {
+            "weights": dict(zip(self.factors, scenario.weights)),
+            "matches": int(mask.sum()),
+            "results": [{"state": self.states[i], "rank": _number(scenario.ranks[i]),
+                         "score": _number(scenario.scores[i])} for i in order[:max(k, 0)]],
+        }
+
+    def state(self, name, params):
+        row = self.row_of.get(US_STATES.lookup.get(region_key(name), -1))
+        if row is None:
+            raise QueryError(f"unknown state {name!r}", status=404)
+        scenario = self.parse_scenario(params)
+        factors = {
+            f: {"value": _number(self.X[row, j]), "weight": w, "contribution": _number(w * self.X[row, j])}
+            for j, (f, w) in enumerate(zip(self.factors, scenario.weights))
+        }
+        return {
+            "state": self.states[row],
+            "score": _number(scenario.scores[row]),
+            "rank": _number(scenario.ranks[row]),
+            "of": int(np.sum(~np.isnan(scenario.ranks))),
+            "factors": factors,
+            "columns": {c: _number(values[row]) for c, values in self.columns.items()},
+        }
+
+    def dispatch(self, method, target):
+        if method not in ("GET", "HEAD"):
+            raise QueryError(f"{method} not allowed", status=405)
+        url = urlsplit(target)
+        params = parse_qs(url.query)
+        parts = [unquote(p) for p in url.path.split("/") if p]
+        if parts == ["health"]:
+            return self.health(params)
+        if parts == ["rank"]:
+            return self.rank(params)
+        if len(parts) == 2 and parts[0] == "state":
+            return self.state(parts[1], params)
+        raise QueryError(f"no such endpoint {url.path!r}; try /health, /rank or /state/<name>", status=404)
+
+
+# ------------------------------------------------
+# 2. HTTP server
+# ------------------------------------------------
+def respond(model, method, target):
+    start = time.perf_counter()
+    try:
+        status, payload = 200, model.dispatch(method, target)
+    except QueryError as e:
+        status, payload = e.status, {"error": str(e)}
+    except Exception as e:
+        status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    elapsed_ms = (time.perf_counter() - start) * 1e3
+    return status, body, elapsed_ms
+
+
+async def handle(model, reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            if int(headers.get("content-length", 0) or 0):
+                await reader.readexactly(int(headers["content-length"]))
+
+            try:
+                method, target, version = request_line.decode("latin-1").split()
+            except ValueError:
+                method, target, version = "", "/", "HTTP/1.0"
+            if method:
+                status, body, elapsed_ms = respond(model, method, target)
+            else:
+                status, body, elapsed_ms = 400, b'{"error":"malformed request line"}', 0.0
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+
+            head = (f"{version} {status} {STATUS_TEXT[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Server-Timing: app;dur={elapsed_ms:.3f}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+            writer.write(head.encode("latin-1") + (b"" if method == "HEAD" else body))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def watch(model, interval=RELOAD_INTERVAL_S):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if model.reload_if_changed():
+                print(f"↻ Reloaded {len(model.states)} states from {model.path}")
+        except Exception as e:
+            # Most likely caught mid-write; the old model keeps serving
+            print(f"⚠ Reload failed ({type(e).__name__}: {e}); retrying")
+
+
+async def serve(model, host=HOST, port=PORT):
+    server = await asyncio.start_server(lambda r, w: handle(model, r, w), host, port)
+    watcher = asyncio.ensure_future(watch(model))
+    print(f"✅ Serving {len(model.states)} states on http://{host}:{port} (/health, /rank, /state/<name>)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        watcher.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve suitability queries on localhost")
+    parser.add_argument("--host", default=HOST, help=f"address to bind (default {HOST})")
+    parser.add_argument("--port", type=int, default=PORT, help=f"port (default {PORT})")
+    parser.add_argument("--cache", type=int, default=CACHE_SIZE, metavar="N",
+                        help=f"weight scenarios kept in the LRU cache (default {CACHE_SIZE})")
+    args = parser.parse_args(argv)
+    model = SuitabilityModel(cache_size=args.cache)
+    try:
+        asyncio.run(serve(model, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
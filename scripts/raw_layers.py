@@ -0,0 +1,160 @@
+# ================================================================
+# raw_layers.py
+# Column-pruned, bbox-filtered reads of the raw spatial layers
+# ================================================================
+# Every script reads ne_10m_ports, the CZMA and sanctuary GeoPackages,
+# the NFHAP shapefile and the states layer through this module:
+#
+#   read_layer       one read through pyogrio (Arrow batches when the
+#                    installed GDAL / pyarrow support it), decoding only
+#                    the requested attribute columns (columns=[] reads
+#                    geometry only) and only the features whose extent
+#                    meets a lon/lat bbox; the bbox is projected into
+#                    the layer's CRS so OGR filters on its spatial index
+#   cached_layer     read_layer + to_crs, saved as GeoParquet under
+#                    data_processed/layers/ and keyed by the source files
+#                    and the read options, so later runs (and other
+#                    stages asking for the same view) skip both
+#   read_attributes  attributes only, geometry never decoded
+#   read_chunks      fixed-size feature chunks of a large layer
+#
+# Columns missing from a layer are skipped rather than raising, so a
+# caller can list every spelling of a field. Without pyogrio the reads
+# fall back to geopandas / fiona with the same bbox pushed down.
+# ================================================================
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+
+from stage_graph import expand_inputs
+
+data_dir = Path("../data_raw")
+out_dir = Path("../data_processed")
+LAYER_DIR = out_dir / "layers"
+
+
+def _pyogrio():
+    try:
+        import pyogrio
+    except ImportError:
+        return None
+    return pyogrio
+
+
+# ------------------------------------------------
+# 1. Bounding boxes
+# ------------------------------------------------
+def layer_crs(path):
+    # Read from the layer metadata; no features are decoded
+    pyogrio = _pyogrio()
+    if pyogrio is not None:
+        return pyogrio.read_info(path)["crs"]
+    import fiona
+
+    with fiona.open(path) as src:
+        return src.crs_wkt or None
+
+
+def native_bbox(bbox, crs):
+    # Lon/lat (minx, miny, maxx, maxy) -> the same area in the layer's CRS
+    from pyproj import CRS, Transformer
+
+    if crs is None or CRS.from_user_input(crs).equals(CRS.from_epsg(4326)):
+        return tuple(bbox)
+    transformer = Transformer.from_crs("EPSG:4326", crs, always_xy=True)
+    return tuple(transformer.transform_bounds(*bbox, densify_pts=21))
+
+
+# ------------------------------------------------
+# 2. Reads
+# ------------------------------------------------
+def read_layer(path, columns=None, bbox=None):
+    # Opening some formats (GeoJSON) parses the whole file, so the metadata
+    # is only read when a bbox has to be projected
+    if bbox is not None:
+        bbox = native_bbox(bbox, layer_crs(path))
+
+    pyogrio = _pyogrio()
+    if pyogrio is None:
+        gdf = gpd.read_file(path, bbox=bbox)
+        return gdf if columns is None else gdf[[c for c in columns if c in gdf.columns] + [gdf.geometry.name]]
+    try:
+        return pyogrio.read_dataframe(path, columns=columns, bbox=bbox, use_arrow=True)
+    except Exception:
+        # GDAL < 3.6 or no pyarrow: same read, feature by feature
+        return pyogrio.read_dataframe(path, columns=columns, bbox=bbox)
+
+
+def read_attributes(path, columns):
+    # Attribute-only read: geometry is never decoded. pyogrio reads just the
+    # requested fields (through Arrow when available); fiona is the fallback.
+    pyogrio = _pyogrio()
+    if pyogrio is None:
+        return pd.DataFrame(gpd.read_file(path, ignore_geometry=True)[columns])
+    try:
+        return pyogrio.read_dataframe(path, columns=columns, read_geometry=False, use_arrow=True)
+    except Exception:
+        return pyogrio.read_dataframe(path, columns=columns, read_geometry=False)
+
+
+def read_chunks(path, columns, chunk_rows):
+    pyogrio = _pyogrio()
+    start = 0
+    while True:
+        if pyogrio is None:
+            chunk = gpd.read_file(path, rows=slice(start, start + chunk_rows))
+        else:
+            chunk = pyogrio.read_dataframe(path, columns=columns, skip_features=start, max_features=chunk_rows)
+        if chunk.empty:
+            return
+        yield chunk[columns + ['geometry']]
+        start += chunk_rows
+
+
+# ------------------------------------------------
+# 3. Reprojected, cached views
+# ------------------------------------------------
+def source_stamp(path):
+    stamp = [(p.name, p.stat().st_size, p.stat().st_mtime_ns) for p in expand_inputs([path])]
+    return hashlib.sha256(json.dumps(stamp).encode()).hexdigest()[:16]
+
+
+def _read_view(path, crs):
+    # gpd.read_parquet rebuilds the CRS from the file's PROJJSON, which costs
+    # more than the rest of the read for small layers; the CRS the caller
+    # asked for is resolved from its code instead
+    import pyarrow.parquet as pq
+
+    if crs is None:
+        return gpd.read_parquet(path)
+    table = pq.read_table(path)
+    geometry = gpd.GeoSeries.from_wkb(table.column("geometry").to_pandas().to_numpy(), crs=crs)
+    return gpd.GeoDataFrame(table.drop(["geometry"]).to_pandas(), geometry=geometry)
+
+
+def cached_layer(path, columns=None, bbox=None, crs=None, layer_dir=LAYER_DIR):
+    layer_dir = Path(layer_dir)
+    stem, stamp = Path(path).stem, source_stamp(path)
+    options = json.dumps([columns, None if bbox is None else [float(v) for v in bbox], crs])
+    cached = layer_dir / f"{stem}-{stamp}-{hashlib.sha256(options.encode()).hexdigest()[:16]}.parquet"
+    if cached.exists():
+        return _read_view(cached, crs)
+
+    gdf = read_layer(path, columns, bbox)
+    if crs is not None:
+        gdf = gdf.to_crs(crs)
+    layer_dir.mkdir(parents=True, exist_ok=True)
+    # Views of an older version of the source are stale
+    for old in layer_dir.glob(f"{stem}-*.parquet"):
+        if not old.name.startswith(f"{stem}-{stamp}-"):
+            old.unlink()
+    # Parallel stages may build the same view; the rename is atomic
+    tmp = cached.with_suffix(f".{os.getpid()}.tmp")
+    gdf.to_parquet(tmp)
+    os.replace(tmp, cached)
+    return gdf
@@ -0,0 +1,131 @@
+# ================================================================
+# regions.py
+# Canonical region registry and code-aligned factor matrices
+# ================================================================
+# A RegionRegistry maps every spelling of a region it knows (name,
+# abbreviation, FIPS code, aliases; case, punctuation and spacing are
+# ignored) to one integer code, once per distinct key. US_STATES covers
+# the 50 states, DC and the inhabited territories.
+#
+# FactorMatrix replaces chains of DataFrame.merge on free-text names: it
+# preallocates a (units x factors) array and writes each factor table in
+# by region code with a single fancy-indexed assignment. Keys that do not
+# land on a unit (unknown spellings, or regions missing from the units)
+# are collected for report() instead of silently becoming NaN. The same
+# classes work for counties or grid cells given a registry of their keys.
+# ================================================================
+
+import re
+
+import numpy as np
+import pandas as pd
+
+# (FIPS, USPS abbreviation, name)
+STATE_RECORDS = [
+    (1, "AL", "Alabama"), (2, "AK", "Alaska"), (4, "AZ", "Arizona"), (5, "AR", "Arkansas"),
+    (6, "CA", "California"), (8, "CO", "Colorado"), (9, "CT", "Connecticut"), (10, "DE", "Delaware"),
+    (11, "DC", "District of Columbia"), (12, "FL", "Florida"), (13, "GA", "Georgia"), (15, "HI", "Hawaii"),
+    (16, "ID", "Idaho"), (17, "IL", "Illinois"), (18, "IN", "Indiana"), (19, "IA", "Iowa"),
+    (20, "KS", "Kansas"), (21, "KY", "Kentucky"), (22, "LA", "Louisiana"), (23, "ME", "Maine"),
+    (24, "MD", "Maryland"), (25, "MA", "Massachusetts"), (26, "MI", "Michigan"), (27, "MN", "Minnesota"),
+    (28, "MS", "Mississippi"), (29, "MO", "Missouri"), (30, "MT", "Montana"), (31, "NE", "Nebraska"),
+    (32, "NV", "Nevada"), (33, "NH", "New Hampshire"), (34, "NJ", "New Jersey"), (35, "NM", "New Mexico"),
+    (36, "NY", "New York"), (37, "NC", "North Carolina"), (38, "ND", "North Dakota"), (39, "OH", "Ohio"),
+    (40, "OK", "Oklahoma"), (41, "OR", "Oregon"), (42, "PA", "Pennsylvania"), (44, "RI", "Rhode Island"),
+    (45, "SC", "South Carolina"), (46, "SD", "South Dakota"), (47, "TN", "Tennessee"), (48, "TX", "Texas"),
+    (49, "UT", "Utah"), (50, "VT", "Vermont"), (51, "VA", "Virginia"), (53, "WA", "Washington"),
+    (54, "WV", "West Virginia"), (55, "WI", "Wisconsin"), (56, "WY", "Wyoming"),
+    (60, "AS", "American Samoa"), (66, "GU", "Guam"), (69, "MP", "Northern Mariana Islands"),
+    (72, "PR", "Puerto Rico"), (78, "VI", "U.S. Virgin Islands"),
+]
+STATE_ALIASES = {
+    "Washington DC": "DC",
+    "Washington D.C.": "DC",
+    "Virgin Islands": "VI",
+    "US Virgin Islands": "VI",
+    "United States Virgin Islands": "VI",
+    "Commonwealth of the Northern Mariana Islands": "MP",
+}
+
+
+def region_key(value):
+    # Case-, punctuation- and spacing-insensitive lookup key; FIPS numbers
+    # match with or without leading zeros
+    if isinstance(value, (int, np.integer)) or (isinstance(value, float) and value.is_integer()):
+        return str(int(value))
+    key = re.sub(r"[^0-9a-z]+", " ", str(value).casefold()).strip()
+    return str(int(key)) if key.isdigit() else key
+
+
+class RegionRegistry:
+    def __init__(self, records, aliases=None):
+        self.fips, self.abbrevs, self.names = (np.array(column, dtype=object) for column in zip(*records))
+        self.lookup = {}
+        for code, record in enumerate(records):
+            for value in record:
+                self.lookup[region_key(value)] = code
+        for alias, target in (aliases or {}).items():
+            self.lookup[region_key(alias)] = self.lookup[region_key(target)]
+
+    def __len__(self):
+        return len(self.names)
+
+    def codes(self, keys):
+        # Integer code per key, -1 where the key is unknown or missing; each
+        # distinct key is looked up once
+        factorized, uniques = pd.factorize(pd.Series(keys, dtype=object))
+        unique_codes = np.array([self.lookup.get(region_key(k), -1) for k in uniques], dtype=np.int64)
+        return np.append(unique_codes, -1)[factorized]
+
+    def names_of(self, codes):
+        return np.where(codes >= 0, self.names[codes], None)
+
+    def abbrevs_of(self, codes):
+        return np.where(codes >= 0, self.abbrevs[codes], None)
+
+    def canonical(self, keys):
+        # Canonical names; unknown keys are kept, stripped
+        keys = pd.Series(keys, dtype=object)
+        names = pd.Series(self.names_of(self.codes(keys)), index=keys.index, dtype=object)
+        return names.fillna(keys.str.strip())
+
+
+US_STATES = RegionRegistry(STATE_RECORDS, STATE_ALIASES)
+
+
+class FactorMatrix:
+    def __init__(self, registry, unit_keys, columns):
+        self.registry = registry
+        unit_codes = registry.codes(unit_keys)
+        # Unit row of each region code (-1: region not among the units)
+        self.row_of = np.full(len(registry) + 1, -1)
+        present = unit_codes >= 0
+        self.row_of[unit_codes[present]] = np.flatnonzero(present)
+        self.columns = list(columns)
+        self.values = np.full((len(unit_codes), len(self.columns)), np.nan)
+        self.unmatched = {}
+        unknown_units = pd.Series(unit_keys, dtype=object)[~present]
+        if len(unknown_units):
+            self.unmatched["units"] = sorted(set(unknown_units.dropna().astype(str)))
+
+    def fill(self, source, keys, frame):
+        # Writes frame's columns for every row whose key lands on a unit;
+        # for repeated keys the last row wins
+        rows = self.row_of[self.registry.codes(keys)]
+        hit = rows >= 0
+        cols = [self.columns.index(c) for c in frame.columns]
+        self.values[np.ix_(rows[hit], cols)] = frame.to_numpy(dtype=float)[hit]
+        missed = pd.Series(keys, dtype=object)[~hit].dropna()
+        if len(missed):
+            self.unmatched[source] = sorted(set(missed.astype(str)))
+
+    def report(self):
+        return [f"⚠ {source}: {len(keys)} unmatched key(s): {', '.join(map(repr, keys))}"
+                for source, keys in self.unmatched.items()]
+
+    def join(self, units):
+        # units (in unit_keys order) with one column per factor
+        units = units.copy()
+        for j, column in enumerate(self.columns):
+            units[column] = self.values[:, j]
+        return units
@@ -3,8 +3,7 @@ import re
 import sys
 import numpy as np
 
-CSV_INPUT = sys.argv[1]
-CSV_OUTPUT = CSV_INPUT.rsplit(".csv", 1)[0] + "_scored.csv"
+from normalization import normalize_series
 
 # Weights for each category
 WEIGHTS = {
@@ -13,82 +12,102 @@ WEIGHTS = {
     "time_norm": 0.4
 }
 
-df = pd.read_csv(CSV_INPUT)
-
-# --- Convert fields to numeric ---
-
-def parse_laws(value):
-    if pd.isna(value):
-        return None
-    value_str = str(value).strip().lower()
-    if value_str == "yes":
-        return 1
-    elif value_str == "no":
-        return 0
-    else:
-        return None
-
-def parse_fees(value):
-    if pd.isna(value) or str(value).strip().upper() in ["N/A", "No"]:
-        return None
-    
-    # Convert to string, split by newlines, extract numbers
-    nums = re.findall(r"\d+", str(value))
-    nums_int = [int(n) for n in nums]
-    return sum(nums_int) if nums_int else 0
-
-def parse_timeframe(value):
-    if pd.isna(value) or str(value).strip().upper() == "N/A":
-        return None
-    months_total = 0
-    for match in re.findall(r"(\d+(?:\.\d+)?)\s*(years|year|months|month)", str(value), flags=re.IGNORECASE):
-        num, unit = match
-        num = float(num)
-        if "year" in unit.lower():
-            months_total += num * 12
-        else:
-            months_total += num
-    return months_total if months_total > 0 else None
-
-# Apply parsing
-df["laws_numeric"] = df["aquaculture leasing/permitting law(s)"].apply(parse_laws)
-df["fees_numeric"] = df["Application Fees"].apply(parse_fees)
-df["time_numeric"] = df["Lease Review/Approval Timeframe"].apply(parse_timeframe)
-
-# Normalize function
+LAWS_COL = "aquaculture leasing/permitting law(s)"
+FEES_COL = "Application Fees"
+TIME_COL = "Lease Review/Approval Timeframe"
+
+FEE_PATTERN = re.compile(r"(\d+)")
+TIME_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(years|year|months|month)", flags=re.IGNORECASE)
+
+# --- Convert fields to numeric (column-wise) ---
+
+def _is_na(series):
+    # Missing or the literal "N/A" marker written by parse_state_texts.py
+    return series.isna() | series.astype(str).str.strip().str.upper().eq("N/A")
+
+def parse_laws(series):
+    # "yes" -> 1, "no" -> 0, anything else (or missing) -> NaN
+    return series.astype(str).str.strip().str.lower().map({"yes": 1, "no": 0})
+
+def _extract(series, pattern):
+    # Matches of ``pattern`` in each distinct value of ``series`` (missing
+    # values count as empty text): the value code of every row, the number
+    # of distinct values, the value each match came from and its groups
+    text = series.astype(object).where(series.notna(), "").astype(str)
+    codes, uniques = pd.factorize(text)
+    matches = pd.Series(uniques, dtype=object).str.extractall(pattern)
+    owner = matches.index.get_level_values(0).to_numpy(dtype=np.int64)
+    return codes, len(uniques), owner, matches.to_numpy(dtype=object)
+
+def parse_fees(series):
+    # Sum of every integer in the text; 0 if there are none, NaN if N/A
+    codes, n_unique, owner, groups = _extract(series, FEE_PATTERN)
+    totals = np.bincount(owner, weights=groups[:, 0].astype(float), minlength=n_unique)
+    fees = pd.Series(totals.astype("int64")[codes], index=series.index)
+    return fees.where(~_is_na(series))
+
+def parse_timeframe(series):
+    # Total months over every "<n> year(s)/month(s)"; NaN if none or N/A
+    codes, n_unique, owner, groups = _extract(series, TIME_PATTERN)
+    per_unit = np.where(np.char.find(np.char.lower(groups[:, 1].astype(str)), "year") >= 0, 12, 1)
+    months = np.bincount(owner, weights=groups[:, 0].astype(float) * per_unit, minlength=n_unique)
+    total = pd.Series(months[codes], index=series.index)
+    return total.where((total > 0) & ~_is_na(series))
+
+# Normalize function (min-max over non-missing values; constant -> 1)
 def normalize(series):
     valid = series.dropna()
-    if valid.empty:
-        return series
-    min_val = valid.min()
-    max_val = valid.max()
-    if min_val == max_val:
-        return series.apply(lambda x: 1 if pd.notna(x) else np.nan)
-    return series.apply(lambda x: (x - min_val) / (max_val - min_val) if pd.notna(x) else np.nan)
-
-# --- Normalize ---
-df["laws_norm"] = df["laws_numeric"]  # 0 or 1
-df["fees_norm"] = normalize(df["fees_numeric"])
-df["time_norm"] = normalize(df["time_numeric"])
+    if not valid.empty and valid.min() == valid.max():
+        # Integer 1 where present, as the row-wise scorer wrote it
+        return series.notna().astype(int).where(series.notna())
+    return normalize_series(series, "minmax", constant=1.0)
 
 # --- Compute weighted score ---
-def compute_score(row):
-    # If all values are missing, return N/A
-    if pd.isna(row["laws_norm"]) and pd.isna(row["fees_norm"]) and pd.isna(row["time_norm"]):
-        return "N/A"
-    
-    score = 0
-    total_weight = 0
-    for col, weight in WEIGHTS.items():
-        val = row.get(col)
-        if pd.notna(val):
-            score += val * weight
-            total_weight += weight
-    if total_weight == 0:
-        return "N/A"
-    return score / total_weight
-
-df["regulatory_access_score"] = df.apply(compute_score, axis=1)
-
-df.to_csv(CSV_OUTPUT, index=False)
-print(f"✅ Processed '{CSV_INPUT}', saved scored data to '{CSV_OUTPUT}'")
+def compute_score(df, weights=WEIGHTS):
+    # Weighted mean over the categories present in each row; "N/A" if none are
+    score = np.zeros(len(df))
+    total_weight = np.zeros(len(df))
+    for col, weight in weights.items():
+        values = df[col].to_numpy(dtype=float)
+        present = ~np.isnan(values)
+        score += np.where(present, values * weight, 0)
+        total_weight += np.where(present, weight, 0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result = pd.Series(score / total_weight, index=df.index)
+    missing = total_weight == 0
+    if missing.any():
+        result = result.astype(object)
+        result[missing] = "N/A"
+    return result
+
+def score_frame(df, weights=WEIGHTS):
+    df = df.copy()
+    df["laws_numeric"] = parse_laws(df[LAWS_COL])
+    df["fees_numeric"] = parse_fees(df[FEES_COL])
+    df["time_numeric"] = parse_timeframe(df[TIME_COL])
+
+    # --- Normalize ---
+    df["laws_norm"] = df["laws_numeric"]  # 0 or 1
+    df["fees_norm"] = normalize(df["fees_numeric"])
+    df["time_norm"] = normalize(df["time_numeric"])
+
+    df["regulatory_access_score"] = compute_score(df, weights)
+    return df
+
+def score_csv(csv_input, csv_output=None):
+    csv_output = csv_output or csv_input.rsplit(".csv", 1)[0] + "_scored.csv"
+    df = score_frame(pd.read_csv(csv_input))
+    df.to_csv(csv_output, index=False)
+    return csv_output
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    CSV_INPUT = argv[0]
+    CSV_OUTPUT = score_csv(CSV_INPUT, argv[1] if len(argv) > 1 else None)
+    print(f"✅ Processed '{CSV_INPUT}', saved scored data to '{CSV_OUTPUT}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# ================================================================
+# sensitivity.py
+# Monte Carlo weight-sensitivity and rank-stability analysis
+# ================================================================
+# Samples weight vectors around the section-10 index weights (or the
+# regulatory_scoring WEIGHTS with --model regulatory), scores
+# every state under each draw with index_engine, and reports per state
+# the rank distribution, P(top-k) and a first-order (Sobol-style)
+# importance of each factor's weight.
+#
+# Draws are processed in fixed-size chunks spread over a process pool.
+# Each chunk returns only running sums (rank histogram, per-bin score
+# sums for the Sobol estimate), so memory is bounded by
+# chunk_size x states regardless of the total number of draws. Chunk
+# seeds are spawned from one SeedSequence, so results depend only on
+# --seed, --draws and --chunk-size, not on --workers.
+# ================================================================
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from index_engine import INDEX_WEIGHTS, factor_matrix, rank_scores, score_scenarios
+from regulatory_scoring import WEIGHTS as REGULATORY_WEIGHTS
+
+out_dir = Path("../data_processed")
+
+SOBOL_BINS = 32
+PILOT_DRAWS = 20000
+
+
+# ------------------------------------------------
+# 1. Weight samplers
+# ------------------------------------------------
+def sample_weights(rng, base, n, sampler="dirichlet", concentration=50.0, spread=0.5):
+    # dirichlet: Dirichlet(concentration * base), centred on the base weights
+    # uniform:   each weight drawn in base * [1 - spread, 1 + spread], then rescaled
+    base = np.asarray(base, dtype=float)
+    if sampler == "dirichlet":
+        return rng.dirichlet(concentration * base / base.sum(), size=n)
+    if sampler == "uniform":
+        W = rng.uniform(base * (1 - spread), base * (1 + spread), size=(n, base.size))
+        return W * (base.sum() / W.sum(axis=1, keepdims=True))
+    raise ValueError("sampler must be 'dirichlet' or 'uniform'")
+
+
+# ------------------------------------------------
+# 2. Per-chunk accumulation
+# ------------------------------------------------
+def run_chunk(X, base, edges, n, seed, options):
+    rng = np.random.default_rng(seed)
+    W = sample_weights(rng, base, n, options["sampler"], options["concentration"], options["spread"])
+    scores = score_scenarios(X, W, options["nan_policy"])
+    ranks = rank_scores(scores)
+    n_regions = X.shape[0]
+
+    # Rank histogram: regions x ranks
+    valid = ~np.isnan(ranks)
+    flat = (np.nonzero(valid)[1] * n_regions + ranks[valid].astype(int) - 1)
+    rank_counts = np.bincount(flat, minlength=n_regions * n_regions).reshape(n_regions, n_regions)
+
+    # Per-(factor, bin) sums of each region's score for the first-order estimate
+    Y = np.nan_to_num(scores)
+    n_bins = edges.shape[1] + 1
+    bin_counts = np.zeros((W.shape[1], n_bins))
+    bin_sums = np.zeros((W.shape[1], n_bins, n_regions))
+    for j in range(W.shape[1]):
+        b = np.searchsorted(edges[j], W[:, j])
+        bin_counts[j] = np.bincount(b, minlength=n_bins)
+        onehot = np.zeros((n, n_bins))
+        onehot[np.arange(n), b] = 1.0
+        bin_sums[j] = onehot.T @ Y
+
+    return {
+        "rank_counts": rank_counts,
+        "bin_counts": bin_counts,
+        "bin_sums": bin_sums,
+        "sum": Y.sum(axis=0),
+        "sumsq": (Y ** 2).sum(axis=0),
+        "n": n,
+    }
+
+
+def _run_chunk(args):
+    return run_chunk(*args)
+
+
+# ------------------------------------------------
+# 3. Driver
+# ------------------------------------------------
+def run_sensitivity(X, base, draws, chunk_size=100000, workers=1, seed=0, sampler="dirichlet",
+                    concentration=50.0, spread=0.5, nan_policy="renormalize"):
+    X = np.asarray(X, dtype=float)
+    base = np.asarray(base, dtype=float)
+    options = {"sampler": sampler, "concentration": concentration,
+               "spread": spread, "nan_policy": nan_policy}
+
+    n_chunks = -(-draws // chunk_size)
+    pilot_seed, *chunk_seeds = np.random.SeedSequence(seed).spawn(n_chunks + 1)
+
+    # Quantile bin edges for each weight, from a pilot sample
+    pilot = sample_weights(np.random.default_rng(pilot_seed), base, PILOT_DRAWS, sampler, concentration, spread)
+    qs = np.linspace(0, 1, SOBOL_BINS + 1)[1:-1]
+    edges = np.quantile(pilot, qs, axis=0).T
+
+    sizes = [min(chunk_size, draws - i * chunk_size) for i in range(n_chunks)]
+    tasks = [(X, base, edges, n, s, options) for n, s in zip(sizes, chunk_seeds)]
+
+    total = None
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for part in pool.map(_run_chunk, tasks):
+                total = part if total is None else {k: total[k] + part[k] for k in total}
+    else:
+        for task in tasks:
+            part = _run_chunk(task)
+            total = part if total is None else {k: total[k] + part[k] for k in total}
+    return total
+
+
+def summarize(total, regions, factors, base_ranks, top_k=5):
+    counts = total["rank_counts"]
+    n_ranked = counts.sum(axis=1)
+    ranks = np.arange(1, counts.shape[1] + 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        probs = counts / n_ranked[:, None]
+        cdf = np.cumsum(probs, axis=1)
+
+    def rank_quantile(q):
+        return np.where(n_ranked > 0, (cdf < q).sum(axis=1) + 1, np.nan)
+
+    states = pd.DataFrame({
+        "state": regions,
+        "base_rank": base_ranks,
+        "mean_rank": probs @ ranks,
+        "rank_p05": rank_quantile(0.05),
+        "median_rank": rank_quantile(0.5),
+        "rank_p95": rank_quantile(0.95),
+        f"p_top{top_k}": cdf[:, min(top_k, counts.shape[1]) - 1],
+    }).sort_values("mean_rank")
+
+    # First-order index S_j = Var(E[Y | w_j]) / Var(Y), pooled over states
+    n = total["n"]
+    mean = total["sum"] / n
+    var = total["sumsq"] / n - mean ** 2
+    bin_counts = total["bin_counts"][:, :, None]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        bin_means = total["bin_sums"] / bin_counts
+    between = np.nansum(bin_counts * (bin_means - mean) ** 2, axis=1) / n
+    importance = pd.DataFrame({
+        "factor": factors,
+        "first_order": between.sum(axis=1) / var.sum(),
+    }).sort_values("first_order", ascending=False)
+
+    return states, importance
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo weight sensitivity of the suitability index")
+    parser.add_argument("--model", choices=["index", "regulatory"], default="index",
+                        help="section-10 index weights, or regulatory_scoring.WEIGHTS "
+                             "(then --input is a *_parsed_scored.csv)")
+    parser.add_argument("--input", default=str(out_dir / "aquaculture_suitability_full.csv"))
+    parser.add_argument("--draws", type=int, default=1000000)
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sampler", choices=["dirichlet", "uniform"], default="dirichlet")
+    parser.add_argument("--concentration", type=float, default=50.0,
+                        help="Dirichlet concentration (higher = tighter around the base weights)")
+    parser.add_argument("--spread", type=float, default=0.5,
+                        help="relative half-width for the uniform sampler")
+    parser.add_argument("--nan-policy", default="renormalize")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    merged = pd.read_csv(args.input)
+    weights = INDEX_WEIGHTS if args.model == "index" else REGULATORY_WEIGHTS
+    factors = list(weights)
+    base = [weights[f] for f in factors]
+    X = factor_matrix(merged, factors)
+
+    total = run_sensitivity(X, base, args.draws, args.chunk_size, args.workers, args.seed,
+                            args.sampler, args.concentration, args.spread, args.nan_policy)
+    base_ranks = rank_scores(score_scenarios(X, base, args.nan_policy))[0]
+    states, importance = summarize(total, merged["state"].to_numpy(), factors, base_ranks, args.top_k)
+
+    out_dir.mkdir(exist_ok=True)
+    states.to_csv(out_dir / "sensitivity_rank_stability.csv", index=False)
+    importance.to_csv(out_dir / "sensitivity_factor_importance.csv", index=False)
+    print(states.to_string(index=False))
+    print(importance.to_string(index=False))
+    print(f"✅ {args.draws} weight draws analysed. Saved to {out_dir}")
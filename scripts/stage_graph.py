@@ -0,0 +1,212 @@
+# ================================================================
+# stage_graph.py
+# Cached, incremental stage runner for full_pipeline.py
+# ================================================================
+# Each stage declares the raw files it reads, the parameters it uses,
+# the stages it depends on, and the code it runs beyond its own body:
+# helper functions and module constants (code) and helper modules, whose
+# whole source counts (modules). Its output frame is persisted as
+# (Geo)Parquet under data_processed/stages/ and keyed by a hash of all
+# of those, so a re-run only recomputes stages whose inputs or code
+# changed.
+# ================================================================
+
+import hashlib
+import importlib
+import inspect
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+
+from profiling import StageProfiler
+
+HASH_CHUNK = 1 << 20
+
+
+@dataclass
+class Stage:
+    name: str
+    func: object
+    inputs: list = field(default_factory=list)
+    params: dict = field(default_factory=dict)
+    deps: list = field(default_factory=list)
+    code: list = field(default_factory=list)
+    modules: list = field(default_factory=list)
+
+
+def code_fingerprint(obj):
+    # Source of a function or class; the JSON of a constant
+    if inspect.isfunction(obj) or inspect.isclass(obj):
+        return inspect.getsource(obj)
+    return json.dumps(obj, sort_keys=True, default=str)
+
+
+# ------------------------------------------------
+# Input fingerprints
+# ------------------------------------------------
+def expand_inputs(paths):
+    # Shapefiles live in several sidecar files (.dbf, .shx, .prj, ...)
+    files = []
+    for p in map(Path, paths):
+        if p.suffix.lower() == ".shp":
+            files.extend(sorted(p.parent.glob(p.stem + ".*")))
+        else:
+            files.append(p)
+    return files
+
+
+class StageCache:
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.cache_dir / "manifest.json"
+        self.manifest = self._read_json(self.manifest_path, {"stages": {}, "files": {}})
+
+    @staticmethod
+    def _read_json(path, default):
+        if path.exists():
+            with open(path) as f:
+                return json.load(f)
+        return default
+
+    def flush(self):
+        tmp = self.manifest_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def file_hash(self, path):
+        # Content hash, memoized on (size, mtime) so unchanged files are not re-read
+        path = Path(path)
+        if not path.exists():
+            return "missing"
+        st = path.stat()
+        stamp = [st.st_size, st.st_mtime_ns]
+        known = self.manifest["files"].get(str(path))
+        if known and known["stamp"] == stamp:
+            return known["sha256"]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self.manifest["files"][str(path)] = {"stamp": stamp, "sha256": digest}
+        return digest
+
+    def stage_key(self, stage, dep_keys):
+        h = hashlib.sha256()
+        h.update(stage.name.encode())
+        h.update(inspect.getsource(stage.func).encode())
+        for obj in stage.code:
+            h.update(code_fingerprint(obj).encode())
+        for name in stage.modules:
+            h.update(inspect.getsource(importlib.import_module(name)).encode())
+        for p in expand_inputs(stage.inputs):
+            h.update(str(p.name).encode())
+            h.update(self.file_hash(p).encode())
+        h.update(json.dumps(stage.params, sort_keys=True, default=str).encode())
+        for dep in stage.deps:
+            h.update(dep_keys[dep].encode())
+        return h.hexdigest()[:16]
+
+    # ------------------------------------------------
+    # Persisted outputs
+    # ------------------------------------------------
+    def _path(self, name, key):
+        return self.cache_dir / f"{name}-{key}.parquet"
+
+    def has(self, name, key):
+        entry = self.manifest["stages"].get(name)
+        return bool(entry) and entry["key"] == key and self._path(name, key).exists()
+
+    def load(self, name, key):
+        if not self.has(name, key):
+            return None
+        path = self._path(name, key)
+        if self.manifest["stages"][name]["geo"]:
+            return gpd.read_parquet(path)
+        return pd.read_parquet(path)
+
+    def save(self, name, key, frame):
+        old = self.manifest["stages"].get(name)
+        if old and old["key"] != key and self._path(name, old["key"]).exists():
+            self._path(name, old["key"]).unlink()
+        frame.to_parquet(self._path(name, key), index=False)
+        self.manifest["stages"][name] = {"key": key, "geo": isinstance(frame, gpd.GeoDataFrame)}
+        self.flush()
+
+
+# ------------------------------------------------
+# Graph execution
+# ------------------------------------------------
+def resolve_keys(stages, cache):
+    keys = {}
+    for stage in stages:
+        keys[stage.name] = cache.stage_key(stage, keys)
+    return keys
+
+
+def run_stages(stages, cache, force=(), workers=1, profiler=None):
+    # Stages must be listed in dependency order. ``force`` may hold stage
+    # names (or "all") whose cached output is ignored. With workers > 1,
+    # stale stages whose dependencies are ready run concurrently in a
+    # process pool; outputs are cached from the parent process only.
+    # ``profiler`` (a profiling.StageProfiler) times cache loads and stages;
+    # each stage gets one record, "cached" or "computed" with the reason
+    # (cache miss or forced) in its "cache" field.
+    profiler = profiler or StageProfiler()
+    keys = resolve_keys(stages, cache)
+    cache.flush()
+    results = {}
+    stale = []
+    reasons = {}
+    for stage in stages:
+        key = keys[stage.name]
+        if "all" in force or stage.name in force:
+            reasons[stage.name] = "forced"
+        elif not cache.has(stage.name, key):
+            reasons[stage.name] = "miss"
+        else:
+            with profiler.stage(stage.name, status="cached", cache="hit") as record:
+                results[stage.name] = cache.load(stage.name, key)
+                record["rows"] = len(results[stage.name])
+            print(f"✓ {stage.name}: cached ({key})")
+            continue
+        stale.append(stage)
+
+    def finish(stage, frame, record):
+        if record is not None:
+            record["cache"] = reasons[stage.name]
+        cache.save(stage.name, keys[stage.name], frame)
+        results[stage.name] = frame
+
+    if workers <= 1 or len(stale) <= 1:
+        for stage in stale:
+            print(f"▶ {stage.name}: recomputing")
+            finish(stage, *profiler.call(stage.name, call_stage, stage, results))
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while stale or running:
+            for stage in [s for s in stale if all(d in results for d in s.deps)]:
+                print(f"▶ {stage.name}: recomputing (worker)")
+                inputs = {d: results[d] for d in stage.deps}
+                running[pool.submit(profiler.call, stage.name, call_stage, stage, inputs)] = stage
+                stale.remove(stage)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                frame, record = fut.result()
+                # Worker records come back with the result; the parent keeps them
+                profiler.add(record)
+                finish(running.pop(fut), frame, record)
+    return results
+
+
+def call_stage(stage, results):
+    return stage.func(*[results[d] for d in stage.deps], **stage.params)
@@ -0,0 +1,124 @@
+# ================================================================
+# topology.py
+# Quantized, delta-encoded TopoJSON with shared arcs
+# ================================================================
+# to_topology(gdf) encodes polygon geometries the way the TopoJSON
+# reference implementation does:
+#
+#   quantize   coordinates are snapped to a quantization x quantization
+#              integer grid over the layer bounds (the "transform")
+#   join       a vertex is a junction when it is reached from different
+#              neighbours by different rings; rings are cut into arcs at
+#              junctions
+#   dedupe     identical arcs (in either direction) are stored once, so
+#              a border shared by two states is written once; rings are
+#              lists of arc indices (~i for a reversed arc)
+#   delta      every arc is written as its first point and then the
+#              differences between consecutive points
+#
+# Borders must match exactly after quantization to be shared, which holds
+# for the source layer and for pyramid.topo_simplify output. Geometries
+# are written as MultiPolygons with id = row position; attributes are
+# left to the caller (see map_layers.add_states).
+# ================================================================
+
+import numpy as np
+import shapely
+
+# Grid steps across the layer bounds; 1e5 is ~40 m over CONUS
+QUANTIZATION = 100000
+
+
+def _rings(geom):
+    # [[exterior, *holes] coordinate arrays per polygon part]
+    if geom is None or shapely.is_empty(geom):
+        return []
+    return [[shapely.get_coordinates(ring) for ring in (part.exterior, *part.interiors)]
+            for part in shapely.get_parts(geom)]
+
+
+def _quantize(coords, translate, scale):
+    q = np.round((coords - translate) / scale).astype(np.int64)
+    # Drop repeated points (including the closing one), then degenerate rings
+    keep = np.any(q != np.roll(q, 1, axis=0), axis=1)
+    q = q[keep]
+    return q if len(np.unique(q, axis=0)) >= 3 else None
+
+
+def _junctions(rings, quantization):
+    # Points whose (unordered) neighbour pair differs between visits
+    keys = np.concatenate([r[:, 0] * quantization + r[:, 1] for r in rings])
+    prev = np.concatenate([np.roll(r[:, 0] * quantization + r[:, 1], 1) for r in rings])
+    nxt = np.concatenate([np.roll(r[:, 0] * quantization + r[:, 1], -1) for r in rings])
+    visits = np.unique(np.column_stack([keys, np.minimum(prev, nxt), np.maximum(prev, nxt)]), axis=0)
+    points, counts = np.unique(visits[:, 0], return_counts=True)
+    return points[counts > 1]
+
+
+class _ArcIndex:
+    def __init__(self):
+        self.arcs = []
+        self.index = {}
+
+    def add(self, arc):
+        # Returns the arc index, ~index when the arc is stored reversed
+        key = arc.tobytes()
+        if key in self.index:
+            return self.index[key]
+        reverse = arc[::-1].tobytes()
+        if reverse in self.index:
+            return ~self.index[reverse]
+        self.index[key] = len(self.arcs)
+        self.arcs.append(arc)
+        return self.index[key]
+
+    def delta_encoded(self):
+        return [np.vstack([arc[:1], np.diff(arc, axis=0)]).tolist() for arc in self.arcs]
+
+
+def _cut(ring, is_junction, arcs):
+    if not is_junction.any():
+        # Closed ring without junctions: start at its smallest point so that
+        # an identical ring elsewhere (an enclave, a duplicate) is deduped
+        start = np.lexsort((ring[:, 1], ring[:, 0]))[0]
+        ring = np.roll(ring, -start, axis=0)
+        return [arcs.add(np.vstack([ring, ring[:1]]))]
+    cuts = np.flatnonzero(is_junction)
+    ring = np.roll(ring, -cuts[0], axis=0)
+    closed = np.vstack([ring, ring[:1]])
+    bounds = np.append(cuts - cuts[0], len(ring))
+    return [arcs.add(closed[a:b + 1]) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def to_topology(gdf, object_name="states", quantization=QUANTIZATION):
+    x0, y0, x1, y1 = gdf.total_bounds
+    translate = np.array([x0, y0])
+    scale = np.array([(x1 - x0) / (quantization - 1) or 1.0, (y1 - y0) / (quantization - 1) or 1.0])
+
+    # Quantized polygons per geometry: [[exterior, *holes], ...]
+    shapes = []
+    for geom in gdf.geometry:
+        parts = []
+        for rings in _rings(geom):
+            quantized = [_quantize(r, translate, scale) for r in rings]
+            if quantized[0] is not None:
+                parts.append([r for r in quantized if r is not None])
+        shapes.append(parts)
+
+    all_rings = [r for parts in shapes for rings in parts for r in rings]
+    junctions = _junctions(all_rings, quantization) if all_rings else np.array([], dtype=np.int64)
+
+    arcs = _ArcIndex()
+    geometries = []
+    for i, parts in enumerate(shapes):
+        polygons = [[_cut(r, np.isin(r[:, 0] * quantization + r[:, 1], junctions), arcs) for r in rings]
+                    for rings in parts]
+        geometries.append({"type": "MultiPolygon", "arcs": polygons, "id": i} if polygons
+                          else {"type": None, "id": i})
+
+    return {
+        "type": "Topology",
+        "transform": {"scale": scale.tolist(), "translate": translate.tolist()},
+        "objects": {object_name: {"type": "GeometryCollection", "geometries": geometries}},
+        "arcs": arcs.delta_encoded(),
+    }
@@ -0,0 +1,296 @@
+# ================================================================
+# vector_tiles.py
+# Static vector-tile (PMTiles) export and lazy-loading map viewer
+# ================================================================
+# Writes one PMTiles archive per layer (states + suitability scores,
+# CZMA, sanctuaries, ports) holding gzipped Mapbox Vector Tiles for
+# every zoom in [--min-zoom, --max-zoom], plus an index.html that
+# renders them with MapLibre GL. The browser fetches only the tiles in
+# view through HTTP range requests, so the page stays small at any data
+# resolution and the output folder can be served from any static file
+# host (e.g. GitHub Pages) with no tile server.
+#
+# Requires: pip install pmtiles mapbox-vector-tile (not in requirements.txt;
+# they are only imported when tiles are written)
+#
+# Usage:
+#   python vector_tiles.py [--out-dir DIR] [--min-zoom 2] [--max-zoom 10]
+# ================================================================
+
+import argparse
+import gzip
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from factor_store import RAW_LAYERS, load_layer, read_table, table_path
+from map_layers import near_states
+from pyramid import load_pyramid, pyramid_level
+
+out_dir = Path("../data_processed")
+
+WEB_MERCATOR = "EPSG:3857"
+MERC_MAX = 20037508.342789244
+EXTENT = 4096
+# Clip tiles slightly larger than their bounds so strokes don't seam at edges
+BUFFER_PX = 64
+# MapLibre draws a tile at 512 px, so tile zoom z takes the pyramid level
+# built for z + 1 (half a pixel at 256 px, see pyramid.py)
+LEVEL_OFFSET = 1
+
+STATE_FIELDS = ["state", "SuitabilityIndex", "EnvQuality_norm", "perm_norm",
+                "total_sales_$1000_norm", "program_norm", "OpenCoast_norm", "port_norm"]
+
+
+def _tile_libs():
+    try:
+        import mapbox_vector_tile
+        import pmtiles.tile
+        import pmtiles.writer
+    except ImportError as e:
+        raise ImportError("Vector tile export needs mapbox-vector-tile and pmtiles: "
+                          "pip install mapbox-vector-tile pmtiles") from e
+    return mapbox_vector_tile, pmtiles
+
+
+# ------------------------------------------------
+# 1. Tile math
+# ------------------------------------------------
+def tile_size_m(z):
+    return 2 * MERC_MAX / (1 << z)
+
+
+def tile_bounds(z, x, y):
+    size = tile_size_m(z)
+    minx = -MERC_MAX + x * size
+    maxy = MERC_MAX - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+def tile_range(bounds, z):
+    size = tile_size_m(z)
+    n = (1 << z) - 1
+    minx, miny, maxx, maxy = bounds
+    x0 = int(np.clip((minx + MERC_MAX) // size, 0, n))
+    x1 = int(np.clip((maxx + MERC_MAX) // size, 0, n))
+    y0 = int(np.clip((MERC_MAX - maxy) // size, 0, n))
+    y1 = int(np.clip((MERC_MAX - miny) // size, 0, n))
+    return range(x0, x1 + 1), range(y0, y1 + 1)
+
+
+# ------------------------------------------------
+# 2. Encode one layer into a PMTiles archive
+# ------------------------------------------------
+def iter_layer_tiles(levels, layer_name, min_zoom, max_zoom):
+    # Yields (tile id, gzipped MVT bytes) for every non-empty tile; levels is
+    # {zoom: GeoDataFrame} from load_pyramid, rows in the same order at every level
+    mapbox_vector_tile, pmtiles = _tile_libs()
+    gdf = levels[max(levels)]
+    # Plain Python values per feature; missing values are simply left out
+    props = [
+        {k: v for k, v in record.items() if v == v and v is not None}
+        for record in gdf.drop(columns="geometry").astype(object).to_dict("records")
+    ]
+    bounds = gdf.to_crs(WEB_MERCATOR).total_bounds
+
+    for z in range(min_zoom, max_zoom + 1):
+        px = tile_size_m(z) / EXTENT
+        zgeoms = np.asarray(pyramid_level(levels, z + LEVEL_OFFSET).to_crs(WEB_MERCATOR).geometry, dtype=object)
+        tree = shapely.STRtree(zgeoms)
+        xs, ys = tile_range(bounds, z)
+        for x in xs:
+            for y in ys:
+                tb = tile_bounds(z, x, y)
+                pad = BUFFER_PX * px
+                hits = tree.query(shapely.box(tb[0] - pad, tb[1] - pad, tb[2] + pad, tb[3] + pad))
+                if hits.size == 0:
+                    continue
+                clipped = shapely.clip_by_rect(zgeoms[hits], tb[0] - pad, tb[1] - pad, tb[2] + pad, tb[3] + pad)
+                features = [
+                    {"geometry": g, "properties": props[i]}
+                    for g, i in zip(clipped, hits) if not g.is_empty
+                ]
+                if not features:
+                    continue
+                data = mapbox_vector_tile.encode(
+                    [{"name": layer_name, "features": features}],
+                    default_options={"quantize_bounds": tb, "extents": EXTENT},
+                )
+                yield pmtiles.tile.zxy_to_tileid(z, x, y), gzip.compress(data, mtime=0)
+
+
+def write_pmtiles(levels, path, layer_name, min_zoom=2, max_zoom=10):
+    _, pmtiles = _tile_libs()
+    tiles = sorted(iter_layer_tiles(levels, layer_name, min_zoom, max_zoom), key=lambda t: t[0])
+    gdf = levels[max(levels)]
+    minx, miny, maxx, maxy = gdf.to_crs("EPSG:4326").total_bounds
+    # pandas >= 3 reads text as the string dtype, not object
+    fields = {c: "Number" if pd.api.types.is_numeric_dtype(gdf[c]) else "String"
+              for c in gdf.columns if c != "geometry"}
+
+    with open(path, "wb") as f:
+        writer = pmtiles.writer.Writer(f)
+        for tile_id, data in tiles:
+            writer.write_tile(tile_id, data)
+        writer.finalize(
+            {
+                "tile_type": pmtiles.tile.TileType.MVT,
+                "tile_compression": pmtiles.tile.Compression.GZIP,
+                "min_lon_e7": int(minx * 1e7),
+                "min_lat_e7": int(miny * 1e7),
+                "max_lon_e7": int(maxx * 1e7),
+                "max_lat_e7": int(maxy * 1e7),
+                "center_zoom": min_zoom,
+            },
+            {"vector_layers": [{"id": layer_name, "fields": fields,
+                                "minzoom": min_zoom, "maxzoom": max_zoom}]},
+        )
+    return len(tiles)
+
+
+# ------------------------------------------------
+# 3. Viewer
+# ------------------------------------------------
+VIEWER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Aquaculture Suitability Index</title>
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<link rel="stylesheet" href="https://unpkg.com/maplibre-gl@4.7.1/dist/maplibre-gl.css">
+<script src="https://unpkg.com/maplibre-gl@4.7.1/dist/maplibre-gl.js"></script>
+<script src="https://unpkg.com/pmtiles@3.2.1/dist/pmtiles.js"></script>
+<style>
+  html, body, #map {{ margin: 0; height: 100%; }}
+  #layers {{ position: absolute; top: 10px; right: 10px; background: white; padding: 6px 10px;
+            font: 12px Arial; border-radius: 4px; box-shadow: 0 1px 4px rgba(0,0,0,.3); }}
+</style>
+</head>
+<body>
+<div id="map"></div>
+<div id="layers"></div>
+<script>
+const protocol = new pmtiles.Protocol();
+maplibregl.addProtocol("pmtiles", protocol.tile);
+const base = new URL(".", window.location.href).href;
+const fields = {fields};
+
+const map = new maplibregl.Map({{
+  container: "map",
+  center: [-98.35, 39.5],
+  zoom: 3,
+  maxZoom: {max_zoom} + 4,
+  style: {{
+    version: 8,
+    sources: {{
+      basemap: {{type: "raster", tileSize: 256, attribution: "&copy; OpenStreetMap &copy; CARTO",
+                tiles: ["https://a.basemaps.cartocdn.com/light_all/{{z}}/{{x}}/{{y}}.png"]}},
+      states: {{type: "vector", url: "pmtiles://" + base + "states.pmtiles"}},
+      czma: {{type: "vector", url: "pmtiles://" + base + "czma.pmtiles"}},
+      sanctuaries: {{type: "vector", url: "pmtiles://" + base + "sanctuaries.pmtiles"}},
+      ports: {{type: "vector", url: "pmtiles://" + base + "ports.pmtiles"}}
+    }},
+    layers: [
+      {{id: "basemap", type: "raster", source: "basemap"}},
+      {{id: "Suitability Index", type: "fill", source: "states", "source-layer": "states",
+       paint: {{"fill-opacity": 0.7, "fill-outline-color": "#555",
+               "fill-color": ["case", ["==", ["typeof", ["get", "SuitabilityIndex"]], "number"],
+                 ["interpolate", ["linear"], ["get", "SuitabilityIndex"],
+                   0, "#ffffcc", 0.25, "#a1dab4", 0.5, "#41b6c4", 0.75, "#2c7fb8", 1, "#253494"],
+                 "#cccccc"]}}}},
+      {{id: "CZMA Boundaries", type: "fill", source: "czma", "source-layer": "czma",
+       paint: {{"fill-color": "#1f77b4", "fill-opacity": 0.05, "fill-outline-color": "#1f77b4"}}}},
+      {{id: "Marine Sanctuaries", type: "fill", source: "sanctuaries", "source-layer": "sanctuaries",
+       paint: {{"fill-color": "#ff7f0e", "fill-opacity": 0.1, "fill-outline-color": "#ff7f0e"}}}},
+      {{id: "Ports", type: "circle", source: "ports", "source-layer": "ports",
+       paint: {{"circle-radius": 3, "circle-color": "red", "circle-opacity": 0.6}}}}
+    ]
+  }}
+}});
+
+// Popups built client-side from the tile feature properties
+for (const [layer, props] of Object.entries(fields)) {{
+  map.on("click", layer, (e) => {{
+    const p = e.features[0].properties;
+    const html = props.map(([k, label]) => {{
+      const v = p[k];
+      return "<b>" + label + "</b> " + (typeof v === "number" ? v.toFixed(3) : (v ?? "N/A"));
+    }}).join("<br>");
+    new maplibregl.Popup().setLngLat(e.lngLat).setHTML(html).addTo(map);
+  }});
+  map.on("mouseenter", layer, () => map.getCanvas().style.cursor = "pointer");
+  map.on("mouseleave", layer, () => map.getCanvas().style.cursor = "");
+}}
+
+// Layer control
+const panel = document.getElementById("layers");
+for (const layer of Object.keys(fields)) {{
+  const label = document.createElement("label");
+  label.innerHTML = '<input type="checkbox" checked> ' + layer + "<br>";
+  label.querySelector("input").onchange = (e) =>
+    map.setLayoutProperty(layer, "visibility", e.target.checked ? "visible" : "none");
+  panel.appendChild(label);
+}}
+</script>
+</body>
+</html>
+"""
+
+POPUP_FIELDS = {
+    "Suitability Index": [["state", "State:"], ["SuitabilityIndex", "Suitability Index:"],
+                          ["EnvQuality_norm", "Environmental Quality:"], ["perm_norm", "Regulatory Score:"],
+                          ["total_sales_$1000_norm", "Product Value:"], ["program_norm", "Program Density:"],
+                          ["OpenCoast_norm", "Open Coast Area:"], ["port_norm", "Port Accessibility:"]],
+    "CZMA Boundaries": [["CZMADomain", "CZMA Domain:"]],
+    "Marine Sanctuaries": [["siteName", "Sanctuary:"]],
+    "Ports": [["name", "Port:"]],
+}
+
+
+def write_viewer(path, max_zoom):
+    html = VIEWER_HTML.format(fields=json.dumps(POPUP_FIELDS), max_zoom=max_zoom)
+    Path(path).write_text(html, encoding="utf-8")
+
+
+# ------------------------------------------------
+# 4. Export
+# ------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export dashboard layers as PMTiles vector tiles")
+    parser.add_argument("--out-dir", default=str(out_dir / "tiles"))
+    parser.add_argument("--min-zoom", type=int, default=2)
+    parser.add_argument("--max-zoom", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    # Fail before the pyramid is read, not after
+    _tile_libs()
+    tiles_dir = Path(args.out_dir)
+    tiles_dir.mkdir(parents=True, exist_ok=True)
+
+    # Polygons come from the cached pyramid the lightweight dashboard also reads;
+    # ports are points, one level serves every zoom, and only those near the
+    # states are kept, as on the dashboards
+    zooms = range(args.min_zoom + LEVEL_OFFSET, args.max_zoom + LEVEL_OFFSET + 1)
+    states = load_pyramid("states", [table_path("suitability")],
+                          lambda: read_table("suitability", columns=STATE_FIELDS), zooms=zooms)
+    layers = {
+        "states": states,
+        "czma": load_pyramid("czma", [RAW_LAYERS["czma"]],
+                             lambda: load_layer("czma", columns=["CZMADomain"]), zooms=zooms),
+        "sanctuaries": load_pyramid("sanctuaries", [RAW_LAYERS["sanctuaries"]],
+                                    lambda: load_layer("sanctuaries", columns=["siteName"]), zooms=zooms),
+        "ports": {args.max_zoom: near_states(load_layer("ports", columns=["name"]), states[max(states)])},
+    }
+    for name, levels in layers.items():
+        n = write_pmtiles(levels, tiles_dir / f"{name}.pmtiles", name, args.min_zoom, args.max_zoom)
+        print(f"  {name}: {n} tiles")
+
+    write_viewer(tiles_dir / "index.html", args.max_zoom)
+    print(f"✅ Vector tiles and viewer saved to {tiles_dir}")
+
+
+if __name__ == "__main__":
+    main()
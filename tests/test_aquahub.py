@@ -0,0 +1,30 @@
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+import aquahub  # noqa: E402
+
+
+@pytest.mark.parametrize("command, module_name", [
+    ("pipeline", "full_pipeline"), ("serve", "query_service"), ("dashboard", "vector_tiles"),
+])
+def test_static_usage_lists_every_option(command, module_name, capsys):
+    # aquahub answers --help itself; its text must keep up with the real parsers
+    module = __import__(module_name)
+    with pytest.raises(SystemExit):
+        module.main(["--help"])
+    options = set(re.findall(r"--[a-z][a-z-]*", capsys.readouterr().out)) - {"--help", "--headless"}
+    assert options <= set(re.findall(r"--[a-z][a-z-]*", aquahub.COMMANDS[command][2]))
+
+
+def test_help_does_not_import_the_subcommand(capsys):
+    for module_name in ("full_pipeline", "query_service"):
+        sys.modules.pop(module_name, None)
+    aquahub.main(["pipeline", "--help"])
+    aquahub.main(["serve", "-h"])
+    assert "full_pipeline" not in sys.modules and "query_service" not in sys.modules
+    assert capsys.readouterr().out.count("usage: ") == 2
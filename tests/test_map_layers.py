@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+import geopandas as gpd
+from shapely.geometry import MultiPolygon, Point, box
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+from map_layers import near_states  # noqa: E402
+
+
+def test_ports_clipped_to_state_polygons_across_antimeridian():
+    # Alaska with Aleutian islands on both sides of 180 degrees, and Guam
+    states = gpd.GeoDataFrame(
+        {"state": ["Alaska", "Guam"]},
+        geometry=[MultiPolygon([box(-170, 55, -140, 70), box(172, 52, 174, 53), box(-179, 51, -177, 52)]),
+                  box(144.6, 13.2, 145.0, 13.7)],
+        crs="EPSG:4326")
+    ports = gpd.GeoDataFrame(
+        {"name": ["Apra Harbor", "Attu", "Adak", "Anchorage", "Sydney", "Lisbon", "Honolulu"]},
+        geometry=[Point(144.66, 13.44), Point(173.2, 52.9), Point(-176.6, 51.9), Point(-149.9, 61.2),
+                  Point(151.2, -33.9), Point(-9.1, 38.7), Point(-157.9, 21.3)],
+        crs="EPSG:4326")
+    kept = near_states(ports, states)
+    assert sorted(kept["name"]) == ["Adak", "Anchorage", "Apra Harbor", "Attu"]
@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import Point
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+from port_distance import load_port_index  # noqa: E402
+
+PORTS = {
+    "Apra Harbor": (144.66, 13.44),
+    "Pago Pago": (-170.69, -14.28),
+    "Adak": (-176.64, 51.86),
+    "Seattle": (-122.34, 47.60),
+}
+
+
+def test_territories_keep_their_nearest_port(tmp_path):
+    ports_file = tmp_path / "ports.shp"
+    gpd.GeoDataFrame({"name": list(PORTS)}, geometry=[Point(xy) for xy in PORTS.values()],
+                     crs="EPSG:4326").to_file(ports_file)
+    index = load_port_index(ports_file, index_dir=tmp_path / "index")
+
+    # Hagatna (Guam), Tutuila (American Samoa), Attu (western Aleutians)
+    dist, idx = index.query([144.75, -170.70, 173.18], [13.48, -14.30, 52.93])
+    assert list(index.names[idx[:, 0]]) == ["Apra Harbor", "Pago Pago", "Adak"]
+    assert np.all(dist[:2, 0] < 50)
+
+    # The pickled index answers the same
+    cached = load_port_index(ports_file, index_dir=tmp_path / "index")
+    assert list(cached.names[cached.query([144.75], [13.48])[1][:, 0]]) == ["Apra Harbor"]
@@ -0,0 +1,28 @@
+import io
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+import regulatory_scoring as rs  # noqa: E402
+
+
+def test_all_missing_columns():
+    # read_csv turns an all-"N/A" column into float NaN
+    df = pd.read_csv(io.StringIO(f"{rs.FEES_COL},{rs.TIME_COL}\nN/A,N/A\nN/A,N/A\n"))
+    assert rs.parse_fees(df[rs.FEES_COL]).isna().all()
+    assert rs.parse_timeframe(df[rs.TIME_COL]).isna().all()
+
+
+def test_mixed_values():
+    values = pd.Series(["$100 and $250", "N/A", None, "No", "1 year 6 months", "3 months", "varies"])
+    np.testing.assert_array_equal(rs.parse_fees(values), [350, np.nan, np.nan, 0, 7, 3, 0])
+    np.testing.assert_array_equal(rs.parse_timeframe(values), [np.nan, np.nan, np.nan, np.nan, 18, 3, np.nan])
+
+
+def test_constant_column_stays_integer():
+    assert rs.normalize(pd.Series([5.0, 5.0])).tolist() == [1, 1]
+    assert rs.normalize(pd.Series([5.0, 5.0])).dtype.kind == "i"